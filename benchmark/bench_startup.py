@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of import and task generation time.
+
+Usage:
+    python benchmark/bench_startup.py [--stacks 300] [--repeat 5]
+"""
+from __future__ import print_function
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = '''
+import time
+import fabric.api
+started = time.time()
+import fabricawscfn
+elapsed = time.time() - started
+import sys
+heavy = [name for name in ('boto3', 'botocore.config', 'prettytable', 'yaml') if name in sys.modules]
+print('%f %s' % (elapsed, ','.join(heavy) or '-'))
+'''
+
+
+def bench_import(repeat):
+    # Measure in fresh interpreters. (Fabric itself is already loaded by fab)
+    env = dict(os.environ, PYTHONPATH = os.pathsep.join([ROOT, os.environ.get('PYTHONPATH', '')]))
+    results = []
+    heavy = None
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', IMPORT_SCRIPT], env = env).decode('utf-8')
+        elapsed, heavy = output.split()
+        results.append(float(elapsed))
+    return min(results), heavy
+
+
+def bench_generate_task(stacks, repeat, stack_tasks):
+    sys.path.insert(0, ROOT)
+    from fabricawscfn import StackGroup
+
+    results = []
+    for _ in range(repeat):
+        started = time.time()
+        stack_group = StackGroup('bucket', 'prefix', 'templates')
+        for i in range(stacks):
+            stack_group.define_stack('stack%d' % i, 'bench-stack%d' % i, 'stack%d.yaml' % i)
+        namespace = {}
+        stack_group.generate_task(namespace, stack_tasks = stack_tasks)
+        results.append(time.time() - started)
+    return min(results), len(namespace)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Benchmark of import and task generation time.')
+    parser.add_argument('--stacks', type = int, default = 300, help = 'Number of stacks. (Default 300)')
+    parser.add_argument('--repeat', type = int, default = 5, help = 'Repeat count. Best time is reported. (Default 5)')
+    args = parser.parse_args()
+
+    elapsed, heavy = bench_import(args.repeat)
+    print('import fabricawscfn                  : %8.1f ms (heavy modules loaded: %s)' % (elapsed * 1000, heavy))
+    for stack_tasks in (True, False):
+        elapsed, tasks = bench_generate_task(args.stacks, args.repeat, stack_tasks)
+        print('generate_task(%d stacks, %-5s)   : %8.1f ms (%d tasks)' % (args.stacks, stack_tasks, elapsed * 1000, tasks))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of tasks against offline CloudFormation/S3 stand-in. (No network access)
+
+Each scenario runs in a separate process, and reports wall time, API call counts and peak memory.
+Results are compared with stored baseline to detect regressions.
+
+Usage:
+    python benchmark/bench_tasks.py                         # Run all scenarios and compare with baseline.
+    python benchmark/bench_tasks.py -s list_stacks -s list_exports
+    python benchmark/bench_tasks.py --latency 0.02 --throttle-rate 0.05
+    python benchmark/bench_tasks.py --save-baseline         # Store results as new baseline.
+"""
+from __future__ import print_function
+import argparse
+from collections import OrderedDict
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCHMARK_DIR)
+
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+# Options affect results. Baseline is comparable only if they are same.
+SIZE_OPTIONS = ['stacks', 'group_stacks', 'exports', 'resources', 'events', 'changes', 'templates', 'latency',
+                'throttle_rate', 'workers']
+
+SCENARIOS = OrderedDict()
+
+
+def scenario(func):
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+class Bench(object):
+    """
+    StackGroup and FakeAws of a scenario.
+    """
+
+    def __init__(self, options):
+        from fabric.api import env
+        from fabricawscfn import StackGroup
+        from fakeaws import FakeAws, FakeClientPool
+
+        self.options = options
+        self.work_dir = tempfile.mkdtemp(prefix = 'fabricawscfn-bench-')
+        self.templates_dir = os.path.join(self.work_dir, 'templates')
+        os.makedirs(self.templates_dir)
+
+        env.EnvName = 'bench'
+        env.Region = 'us-east-1'
+        env.AccessKeyId = 'bench'
+        env.SecretAccessKey = 'bench'
+        env.NeedConfirm = False
+
+        self.fake = FakeAws(latency = options.latency, throttle_rate = options.throttle_rate)
+        self.stack_group = StackGroup('bench-bucket', 'templates/%(EnvName)s', self.templates_dir) \
+            .cache_dir(os.path.join(self.work_dir, 'cache')) \
+            .max_workers(options.workers)
+        client_pool = FakeClientPool(self.fake)
+        for listener in self.stack_group.client_pool.listeners:
+            client_pool.add_listener(listener)
+        self.stack_group.client_pool = client_pool
+        for i in range(options.group_stacks):
+            self.stack_group.define_stack('stack%d' % i, 'bench-%%(EnvName)s-stack%d' % i, 'stack%d.yaml' % i)
+
+    def close(self):
+        shutil.rmtree(self.work_dir, ignore_errors = True)
+
+    def write_templates(self, upload = True):
+        # Each stack imports export of its parent. (Binary tree of dependencies)
+        for i in range(self.options.group_stacks):
+            lines = [
+                'Parameters:',
+                '  EnvName:',
+                '    Type: String',
+                'Resources:',
+                '  Bucket:',
+                '    Type: AWS::S3::Bucket',
+            ]
+            if i > 0:
+                lines += [
+                    '    Properties:',
+                    '      BucketName: !ImportValue bench-stack%d-Export' % ((i - 1) // 2),
+                ]
+            lines += [
+                'Outputs:',
+                '  Export:',
+                '    Value: !Ref Bucket',
+                '    Export:',
+                '      Name: bench-stack%d-Export' % i,
+            ]
+            self.write_template('stack%d.yaml' % i, '\n'.join(lines) + '\n', upload)
+
+    def write_template(self, relative_path, content, upload = True):
+        body = content.encode('utf-8')
+        with open(os.path.join(self.templates_dir, relative_path), 'wb') as f:
+            f.write(body)
+        if upload:
+            self.fake.put_object(
+                'bench-bucket', 'templates/bench/%s' % relative_path, body
+            )
+
+    def add_account_stacks(self):
+        # Stacks not belong to StackGroup.
+        for i in range(self.options.stacks):
+            self.fake.add_stack('other-stack%05d' % i)
+
+    def add_group_stacks(self, resources = 0):
+        for stack_def in self.stack_group.stack_defs.values():
+            self.fake.add_stack(
+                stack_def.actual_stack_name(),
+                resources = resources,
+                parameters = [{'ParameterKey': 'EnvName', 'ParameterValue': 'bench'}]
+            )
+
+
+@scenario
+def list_stacks(bench):
+    bench.add_account_stacks()
+    bench.add_group_stacks()
+    return bench.stack_group.list_stacks
+
+
+@scenario
+def list_resources(bench):
+    bench.add_group_stacks(resources = bench.options.resources)
+    return bench.stack_group.list_resources
+
+
+@scenario
+def list_exports(bench):
+    bench.add_account_stacks()
+    bench.add_group_stacks()
+    stack_names = list(bench.fake.stacks.keys())
+    for i in range(bench.options.exports):
+        stack_name = stack_names[i % len(stack_names)]
+        bench.fake.add_export(stack_name, '%s-Export%d' % (stack_name, i), 'value%d' % i)
+    return bench.stack_group.list_exports
+
+
+@scenario
+def desc_stack(bench):
+    stack_name = bench.stack_group.stack_defs['stack0'].actual_stack_name()
+    bench.fake.add_stack(stack_name, resources = 10, events = bench.options.events)
+    return lambda: bench.stack_group.desc_stack('stack0')
+
+
+@scenario
+def sync_templates(bench):
+    # Half of templates are synchronized already. Some stale objects are deleted.
+    for i in range(bench.options.templates):
+        bench.write_template('template%d.yaml' % i, 'Description: template %d\n' % i, upload = i % 2 == 0)
+    for i in range(bench.options.templates // 10):
+        bench.fake.put_object('bench-bucket', 'templates/bench/stale%d.yaml' % i, b'stale')
+    return bench.stack_group.sync_templates
+
+
+@scenario
+def dryrun_all(bench):
+    bench.write_templates()
+    bench.add_group_stacks()
+    bench.fake.change_counts[bench.stack_group.stack_defs['stack0'].actual_stack_name()] = bench.options.changes
+    return bench.stack_group.dryrun_all
+
+
+@scenario
+def create_all(bench):
+    bench.write_templates()
+    return bench.stack_group.create_all
+
+
+@scenario
+def update_all(bench):
+    bench.write_templates()
+    bench.add_group_stacks()
+    return bench.stack_group.update_all
+
+
+@scenario
+def update_changed(bench):
+    # Routine deploy. All stacks were deployed by fabricawscfn, and only 3 of them are changed since then.
+    bench.write_templates()
+    bench.add_group_stacks()
+    bench.stack_group.skip_unchanged()
+    for i, stack_def in enumerate(bench.stack_group.stack_defs.values()):
+        fingerprint = stack_def.deployed_fingerprint(
+            [{'ParameterKey': 'EnvName', 'ParameterValue': 'bench'}],
+            bench.fake.stacks[stack_def.actual_stack_name()]
+        )
+        bench.fake.put_parameter(
+            '/fabricawscfn/fingerprint/%s' % stack_def.actual_stack_name(),
+            fingerprint if i >= 3 else 'previous-%s' % fingerprint
+        )
+    # Calls of preparation are not a part of benchmark.
+    bench.fake.calls.clear()
+    return bench.stack_group.update_all
+
+
+@scenario
+def detect_drift(bench):
+    # Every 5th stack is drifted, one of them has drifted resources of multiple pages.
+    bench.add_group_stacks(resources = bench.options.resources)
+    for i, stack_def in enumerate(bench.stack_group.stack_defs.values()):
+        if i % 5 == 0:
+            bench.fake.drift_counts[stack_def.actual_stack_name()] = bench.options.resources if i == 0 else 3
+    return lambda: bench.stack_group.detect_drift(show_diff = True)
+
+
+def run_scenario(name, options):
+    """
+    Run scenario in current process.
+
+    :return: Result.
+    """
+    bench = Bench(options)
+    try:
+        task = SCENARIOS[name](bench)
+        # Task output is not a part of benchmark.
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            started = time.time()
+            task()
+            wall = time.time() - started
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            peak_rss //= 1024
+        return dict(
+            wall = round(wall, 3),
+            calls = bench.fake.total_calls(),
+            api_calls = dict(bench.fake.calls),
+            throttled = bench.fake.throttled,
+            peak_rss_mb = round(peak_rss / 1024.0, 1)
+        )
+    finally:
+        bench.close()
+
+
+def spawn_scenario(name, argv):
+    output = subprocess.check_output(
+        [sys.executable, os.path.abspath(__file__), '--run-scenario', name] + argv
+    ).decode('utf-8')
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(results, baseline, options, tolerance):
+    """
+    Compare results with baseline.
+
+    :return: {Scenario name, List of regressions}
+    """
+    if baseline.get('options') != dict((key, getattr(options, key)) for key in SIZE_OPTIONS):
+        print('Baseline was measured with different options. Skip comparison.')
+        return {}
+
+    regressions = OrderedDict()
+    for name, result in results.items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        found = []
+        if result['calls'] > base['calls']:
+            found.append('calls %d -> %d' % (base['calls'], result['calls']))
+        # Ignore tiny differences of wall time.
+        if result['wall'] > base['wall'] * (1 + tolerance) and result['wall'] - base['wall'] > 0.05:
+            found.append('wall %.3fs -> %.3fs' % (base['wall'], result['wall']))
+        if result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+            found.append('peak memory %.1fMB -> %.1fMB' % (base['peak_rss_mb'], result['peak_rss_mb']))
+        if found:
+            regressions[name] = found
+    return regressions
+
+
+def print_results(results, baseline):
+    from prettytable import PrettyTable
+
+    base_results = (baseline or {}).get('results', {})
+    table = PrettyTable(['Scenario', 'Wall(s)', 'Baseline(s)', 'API calls', 'Baseline calls', 'Throttled', 'Peak RSS(MB)', 'Top API calls'])
+    table.align['Scenario'] = 'l'
+    table.align['Top API calls'] = 'l'
+    for name, result in results.items():
+        base = base_results.get(name, {})
+        top = sorted(result['api_calls'].items(), key = lambda item: (-item[1], item[0]))[:3]
+        table.add_row([
+            name,
+            '%.3f' % result['wall'],
+            '%.3f' % base['wall'] if base else '-',
+            result['calls'],
+            base.get('calls', '-'),
+            result['throttled'],
+            '%.1f' % result['peak_rss_mb'],
+            ', '.join('%s:%d' % item for item in top)
+        ])
+    print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Benchmark of tasks against offline CloudFormation/S3 stand-in.')
+    parser.add_argument('-s', '--scenario', action = 'append', choices = list(SCENARIOS.keys()),
+                        help = 'Scenario to run. (Default all)')
+    parser.add_argument('--stacks', type = int, default = 10000, help = 'Stacks in account. (Default 10000)')
+    parser.add_argument('--group-stacks', type = int, default = 50, help = 'Stacks in StackGroup. (Default 50)')
+    parser.add_argument('--exports', type = int, default = 50000, help = 'Exports in account. (Default 50000)')
+    parser.add_argument('--resources', type = int, default = 200, help = 'Resources per stack. (Default 200)')
+    parser.add_argument('--events', type = int, default = 5000, help = 'Events of described stack. (Default 5000)')
+    parser.add_argument('--changes', type = int, default = 5000, help = 'Changes of large ChangeSet. (Default 5000)')
+    parser.add_argument('--templates', type = int, default = 500, help = 'Templates to synchronize. (Default 500)')
+    parser.add_argument('--latency', type = float, default = 0.005, help = 'Seconds per API call. (Default 0.005)')
+    parser.add_argument('--throttle-rate', type = float, default = 0.0, help = 'Ratio of throttled API calls. (Default 0)')
+    parser.add_argument('--workers', type = int, default = 4, help = 'StackGroup max workers. (Default 4)')
+    parser.add_argument('--baseline', default = DEFAULT_BASELINE, help = 'Baseline JSON file.')
+    parser.add_argument('--save-baseline', action = 'store_true', help = 'Store results as baseline.')
+    parser.add_argument('--tolerance', type = float, default = 0.25,
+                        help = 'Allowed ratio of wall time / memory increase. (Default 0.25)')
+    parser.add_argument('--run-scenario', help = argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.run_scenario:
+        print(json.dumps(run_scenario(options.run_scenario, options)))
+        return
+
+    argv = []
+    for key in SIZE_OPTIONS:
+        argv += ['--%s' % key.replace('_', '-'), str(getattr(options, key))]
+
+    results = OrderedDict()
+    for name in options.scenario or SCENARIOS.keys():
+        print('Running %s...' % name)
+        results[name] = spawn_scenario(name, argv)
+
+    baseline = None
+    if os.path.exists(options.baseline):
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if options.save_baseline:
+        current = dict((key, getattr(options, key)) for key in SIZE_OPTIONS)
+        # Keep other scenarios of baseline when only some scenarios are run.
+        merged = {}
+        if baseline is not None and options.scenario and baseline.get('options') == current:
+            merged.update(baseline['results'])
+        merged.update(results)
+        with open(options.baseline, 'w') as f:
+            json.dump(dict(
+                options = current,
+                python = platform.python_version(),
+                results = merged
+            ), f, indent = 2, sort_keys = True)
+            f.write('\n')
+        print('Baseline saved to %s.' % options.baseline)
+    elif baseline is not None:
+        regressions = compare(results, baseline, options, options.tolerance)
+        for name, found in regressions.items():
+            print('REGRESSION %s: %s' % (name, ', '.join(found)))
+        if regressions:
+            sys.exit(1)
+        print('No regressions.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,617 @@
+# -*- coding: utf-8 -*-
+"""
+Offline stand-in for CloudFormation, S3, SSM and STS.
+
+Real botocore clients are used, so parameter validation, paginators, waiters and retries work as usual.
+Each HTTP attempt is answered by FakeAws on before-send event, and nothing is sent to network.
+Errors (including throttling) are returned as error bodies of the service protocol, and parsed by botocore.
+Successful responses are handed to botocore already parsed.
+"""
+from __future__ import print_function
+from collections import OrderedDict, defaultdict
+import datetime
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+from xml.sax.saxutils import escape
+
+from botocore import xform_name
+from botocore.awsrequest import AWSResponse
+
+from fabricawscfn.clients import ClientPool
+
+# Items per page of paginated APIs.
+PAGE_SIZE = 100
+
+ACCOUNT_ID = '123456789012'
+
+
+class FakeError(Exception):
+    def __init__(self, code, message, status = 400):
+        super(FakeError, self).__init__(message)
+        self.code = code
+        self.message = message
+        self.status = status
+
+
+class _FakeRaw(object):
+    # Raw HTTP response read by AWSResponse.
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+class _FakeParser(object):
+    # Return parsed responses of FakeAws, and parse others(error bodies) by protocol parser.
+    def __init__(self, fake, parser):
+        self.fake = fake
+        self.parser = parser
+
+    def parse(self, response, shape):
+        response_id = response['headers'].get('x-fakeaws-response')
+        if response_id is None:
+            return self.parser.parse(response, shape)
+        return self.fake.pop_response(response_id)
+
+
+class _FakeParserFactory(object):
+    def __init__(self, fake, factory):
+        self.fake = fake
+        self.factory = factory
+
+    def create_parser(self, protocol):
+        return _FakeParser(self.fake, self.factory.create_parser(protocol))
+
+
+class FakeAws(object):
+    """
+    In-memory CloudFormation stacks, exports, change sets and S3 objects.
+    Stack operations complete immediately.
+    """
+
+    def __init__(self, latency = 0.0, throttle_rate = 0.0, seed = 0):
+        """
+        Create FakeAws.
+
+        :param latency: Seconds each HTTP attempt takes.
+        :param throttle_rate: Ratio of HTTP attempts throttled. (0.0 - 1.0. Retried by botocore)
+        :param seed: Random seed of throttling.
+        """
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+
+        # {Operation name, Count} HTTP attempts including retries.
+        self.calls = defaultdict(int)
+        self.throttled = 0
+        self.ids = itertools.count()
+        # {Call id, (Operation model, API parameters)} Calls in flight.
+        self.pending_calls = {}
+        # {Response id, Parsed response} Responses not parsed yet.
+        self.responses = {}
+
+        self.stacks = OrderedDict()
+        self.exports = []
+        self.change_sets = OrderedDict()
+        self.objects = OrderedDict()
+        # {Name, Value}
+        self.ssm_parameters = OrderedDict()
+        self.ssm_versions = {}
+        self.template_parameters = [{'ParameterKey': 'EnvName', 'NoEcho': False}]
+        # Number of changes of each ChangeSet. {Stack name, Count}
+        self.change_counts = {}
+        self.default_change_count = 10
+        # Number of drifted resources of each stack. {Stack name, Count}
+        self.drift_counts = {}
+        # Status polls answered as in progress before drift detection completes.
+        self.drift_detection_polls = 1
+        self.drift_detections = OrderedDict()
+        self.clock = datetime.datetime(2020, 1, 1)
+
+    # ----- Setup -----
+
+    def add_stack(self, stack_name, status = 'CREATE_COMPLETE', resources = 0, events = 1, parameters = None):
+        """
+        Add existing stack.
+
+        :param stack_name: Stack name.
+        :param status: Stack status.
+        :param resources: Number of resources.
+        :param events: Number of events.
+        :param parameters: Stack parameters.
+        :return: Stack.
+        """
+        stack = self.__new_stack(stack_name, status, parameters or [])
+        for i in range(resources):
+            stack['Resources'].append({
+                'LogicalResourceId': 'Resource%d' % i,
+                'PhysicalResourceId': '%s-resource%d' % (stack_name, i),
+                'ResourceType': 'AWS::S3::Bucket',
+                'ResourceStatus': 'CREATE_COMPLETE',
+                'LastUpdatedTimestamp': self.clock
+            })
+        for i in range(events - 1):
+            self.__add_event(stack, 'Resource%d' % i, 'AWS::S3::Bucket', 'CREATE_COMPLETE')
+        self.__add_event(stack, stack_name, 'AWS::CloudFormation::Stack', status)
+        return stack
+
+    def add_export(self, stack_name, name, value):
+        self.exports.append({
+            'ExportingStackId': self.stacks[stack_name]['StackId'],
+            'Name': name,
+            'Value': value
+        })
+
+    def put_parameter(self, name, value):
+        self.ssm_parameters[name] = value
+        self.ssm_versions[name] = self.ssm_versions.get(name, 0) + 1
+
+    def put_object(self, bucket, key, body, metadata = None):
+        self.objects[(bucket, key)] = {
+            'Key': key,
+            'ETag': '"%s"' % hashlib.md5(body).hexdigest(),
+            'Size': len(body),
+            'LastModified': self.clock,
+            'Metadata': metadata or {}
+        }
+
+    def attach(self, client):
+        """
+        Answer HTTP attempts of client.
+
+        :param client: botocore client.
+        """
+        client.meta.events.register('before-parameter-build.*.*', self.__capture_params)
+        client.meta.events.register('before-call.*.*', self.__begin)
+        client.meta.events.register('before-send.*.*', self.__handle)
+        client.meta.events.register('after-call.*.*', self.__end)
+        client.meta.events.register('after-call-error.*.*', self.__end)
+        # Like Stubber, but answer each attempt so retries happen.
+        endpoint = client._endpoint
+        endpoint._response_parser_factory = _FakeParserFactory(self, endpoint._response_parser_factory)
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def pop_response(self, response_id):
+        with self.lock:
+            return self.responses.pop(response_id)
+
+    # ----- Dispatch -----
+
+    def __capture_params(self, params, context, **kwargs):
+        # before-call receives serialized request. Keep API parameters for handler.
+        context['fake_params'] = dict(params)
+
+    def __begin(self, model, params, context, **kwargs):
+        # before-send receives only prepared request. Link it to API parameters by header.
+        with self.lock:
+            call_id = str(next(self.ids))
+            self.pending_calls[call_id] = (model, context.get('fake_params', {}))
+        context['fake_call_id'] = call_id
+        params['headers']['x-fakeaws-call'] = call_id
+
+    def __end(self, context, **kwargs):
+        with self.lock:
+            self.pending_calls.pop(context.get('fake_call_id'), None)
+
+    def __handle(self, request, **kwargs):
+        with self.lock:
+            model, params = self.pending_calls[request.headers['x-fakeaws-call']]
+            self.calls[model.name] += 1
+            throttled = self.throttle_rate and self.random.random() < self.throttle_rate
+            if throttled:
+                self.throttled += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            return self.__error_response(model, FakeError('Throttling', 'Rate exceeded'))
+
+        try:
+            operation = getattr(self, 'op_%s' % xform_name(model.name), None)
+            if operation is None:
+                raise FakeError('InvalidAction', '%s is not supported by FakeAws.' % model.name)
+            with self.lock:
+                parsed = operation(**params)
+        except FakeError as e:
+            return self.__error_response(model, e)
+        parsed['ResponseMetadata'] = {'HTTPStatusCode': 200, 'HTTPHeaders': {}, 'RetryAttempts': 0}
+        with self.lock:
+            response_id = str(next(self.ids))
+            self.responses[response_id] = parsed
+        return AWSResponse('https://fakeaws.local/', 200, {'x-fakeaws-response': response_id}, _FakeRaw(b''))
+
+    def __error_response(self, model, error):
+        # Error body of service protocol.
+        protocol = model.metadata['protocol']
+        if protocol == 'json':
+            headers = {'Content-Type': 'application/x-amz-json-1.1'}
+            body = json.dumps({'__type': error.code, 'message': error.message})
+        elif protocol == 'rest-xml':
+            headers = {'Content-Type': 'application/xml'}
+            body = '<Error><Code>%s</Code><Message>%s</Message></Error>' % (
+                escape(error.code), escape(error.message)
+            )
+        else:
+            headers = {'Content-Type': 'text/xml'}
+            body = '<ErrorResponse><Error><Type>Sender</Type><Code>%s</Code><Message>%s</Message></Error>' \
+                   '<RequestId>fakeaws</RequestId></ErrorResponse>' % (escape(error.code), escape(error.message))
+        return AWSResponse('https://fakeaws.local/', error.status, headers, _FakeRaw(body.encode('utf-8')))
+
+    # ----- Helpers -----
+
+    def __tick(self):
+        self.clock += datetime.timedelta(seconds = 1)
+        return self.clock
+
+    def __new_stack(self, stack_name, status, parameters):
+        stack = {
+            'StackId': 'arn:aws:cloudformation:us-east-1:%s:stack/%s/%08d' % (ACCOUNT_ID, stack_name, len(self.stacks)),
+            'StackName': stack_name,
+            'StackStatus': status,
+            'CreationTime': self.__tick(),
+            'Parameters': list(parameters),
+            'Tags': [],
+            'Outputs': [],
+            'Resources': [],
+            'Events': []
+        }
+        self.stacks[stack_name] = stack
+        return stack
+
+    def __add_event(self, stack, logical_id, resource_type, status):
+        # Events are kept newest first.
+        stack['Events'].insert(0, {
+            'EventId': '%s-%d' % (stack['StackName'], len(stack['Events'])),
+            'StackId': stack['StackId'],
+            'StackName': stack['StackName'],
+            'LogicalResourceId': logical_id,
+            'PhysicalResourceId': stack['StackId'] if resource_type == 'AWS::CloudFormation::Stack' else logical_id,
+            'ResourceType': resource_type,
+            'ResourceStatus': status,
+            'Timestamp': self.__tick()
+        })
+
+    def __complete(self, stack, operation):
+        # Run stack operation to completion at once.
+        stack['StackStatus'] = '%s_IN_PROGRESS' % operation
+        self.__add_event(stack, stack['StackName'], 'AWS::CloudFormation::Stack', stack['StackStatus'])
+        self.__add_event(stack, 'Resource', 'AWS::S3::Bucket', '%s_COMPLETE' % operation)
+        stack['StackStatus'] = '%s_COMPLETE' % operation
+        if operation != 'CREATE':
+            stack['LastUpdatedTime'] = self.clock
+        self.__add_event(stack, stack['StackName'], 'AWS::CloudFormation::Stack', stack['StackStatus'])
+
+    def __stack(self, stack_name):
+        # Deleted stacks are still found by StackId, like CloudFormation does.
+        for candidate in self.stacks.values():
+            if candidate['StackId'] == stack_name:
+                return candidate
+        stack = self.stacks.get(stack_name)
+        if stack is None or stack['StackStatus'] == 'DELETE_COMPLETE':
+            raise FakeError('ValidationError', 'Stack with id %s does not exist' % stack_name)
+        return stack
+
+    def __parameters(self, stack, parameters):
+        # Resolve UsePreviousValue by parameters of stack.
+        previous = dict((param['ParameterKey'], param) for param in stack['Parameters'])
+        resolved = []
+        for param in parameters or []:
+            if param.get('UsePreviousValue'):
+                if param['ParameterKey'] not in previous:
+                    raise FakeError('ValidationError', 'Parameter %s has no previous value' % param['ParameterKey'])
+                param = previous[param['ParameterKey']]
+            resolved.append(dict(param))
+        return resolved
+
+    def __page(self, items, key, token, token_key = 'NextToken', page_size = PAGE_SIZE):
+        start = int(token or 0)
+        page = {key: items[start:start + page_size]}
+        if start + page_size < len(items):
+            page[token_key] = str(start + page_size)
+        return page
+
+    def __describe(self, stack):
+        described = dict(
+            (key, value) for key, value in stack.items() if key not in ('Resources', 'Events', 'TemplateURL')
+        )
+        # Values of NoEcho parameters are masked.
+        no_echo = set(param['ParameterKey'] for param in self.template_parameters if param.get('NoEcho'))
+        described['Parameters'] = [
+            dict(param, ParameterValue = '****') if param['ParameterKey'] in no_echo else param
+            for param in stack['Parameters']
+        ]
+        return described
+
+    # ----- STS -----
+
+    def op_get_caller_identity(self):
+        return {'Account': ACCOUNT_ID, 'Arn': 'arn:aws:iam::%s:user/bench' % ACCOUNT_ID, 'UserId': 'BENCH'}
+
+    # ----- CloudFormation -----
+
+    def op_list_stacks(self, StackStatusFilter = None, NextToken = None):
+        stacks = [
+            stack for stack in self.stacks.values()
+            if not StackStatusFilter or stack['StackStatus'] in StackStatusFilter
+        ]
+        page = self.__page(stacks, 'StackSummaries', NextToken)
+        page['StackSummaries'] = [
+            dict(
+                (key, value) for key, value in stack.items()
+                if key in ('StackId', 'StackName', 'StackStatus', 'CreationTime', 'LastUpdatedTime')
+            )
+            for stack in page['StackSummaries']
+        ]
+        return page
+
+    def op_describe_stacks(self, StackName = None, NextToken = None):
+        if StackName is not None:
+            return {'Stacks': [self.__describe(self.__stack(StackName))]}
+        stacks = [self.__describe(stack) for stack in self.stacks.values() if stack['StackStatus'] != 'DELETE_COMPLETE']
+        return self.__page(stacks, 'Stacks', NextToken)
+
+    def op_list_stack_resources(self, StackName, NextToken = None):
+        return self.__page(self.__stack(StackName)['Resources'], 'StackResourceSummaries', NextToken)
+
+    def op_describe_stack_events(self, StackName, NextToken = None):
+        return self.__page(self.__stack(StackName)['Events'], 'StackEvents', NextToken)
+
+    def op_list_exports(self, NextToken = None):
+        return self.__page(self.exports, 'Exports', NextToken)
+
+    def op_get_template_summary(self, **kwargs):
+        return {'Parameters': [dict(param) for param in self.template_parameters]}
+
+    def op_create_stack(self, StackName, Parameters = None, TemplateURL = None, **kwargs):
+        if StackName in self.stacks and self.stacks[StackName]['StackStatus'] != 'DELETE_COMPLETE':
+            raise FakeError('AlreadyExistsException', 'Stack [%s] already exists' % StackName)
+        stack = self.__new_stack(StackName, 'CREATE_IN_PROGRESS', Parameters or [])
+        stack['TemplateURL'] = TemplateURL
+        stack['Tags'] = list(kwargs.get('Tags', []))
+        self.__complete(stack, 'CREATE')
+        return {'StackId': stack['StackId']}
+
+    def op_update_stack(self, StackName, Parameters = None, TemplateURL = None, **kwargs):
+        stack = self.__stack(StackName)
+        stack['Parameters'] = self.__parameters(stack, Parameters)
+        stack['TemplateURL'] = TemplateURL
+        stack['Tags'] = list(kwargs.get('Tags', stack['Tags']))
+        self.__complete(stack, 'UPDATE')
+        return {'StackId': stack['StackId']}
+
+    def op_delete_stack(self, StackName, **kwargs):
+        try:
+            stack = self.__stack(StackName)
+        except FakeError:
+            return {}
+        self.__complete(stack, 'DELETE')
+        return {}
+
+    def op_create_change_set(self, StackName, ChangeSetName, ChangeSetType = 'UPDATE', Parameters = None,
+                             Description = None, **kwargs):
+        if ChangeSetType == 'CREATE':
+            if StackName in self.stacks and self.stacks[StackName]['StackStatus'] != 'DELETE_COMPLETE':
+                raise FakeError('AlreadyExistsException', 'Stack [%s] already exists' % StackName)
+            stack = self.__new_stack(StackName, 'REVIEW_IN_PROGRESS', [])
+        else:
+            stack = self.__stack(StackName)
+        change_set = {
+            'ChangeSetId': '%s:changeSet/%s' % (stack['StackId'], ChangeSetName),
+            'ChangeSetName': ChangeSetName,
+            'StackId': stack['StackId'],
+            'StackName': StackName,
+            'ChangeSetType': ChangeSetType,
+            'Parameters': self.__parameters(stack, Parameters),
+            'Tags': list(kwargs.get('Tags', stack['Tags'])),
+            'Status': 'CREATE_COMPLETE',
+            'ExecutionStatus': 'AVAILABLE',
+            'CreationTime': self.__tick(),
+            'ChangeCount': self.change_counts.get(StackName, self.default_change_count)
+        }
+        if Description is not None:
+            change_set['Description'] = Description
+        self.change_sets[(StackName, ChangeSetName)] = change_set
+        return {'Id': change_set['ChangeSetId'], 'StackId': stack['StackId']}
+
+    def __change_set(self, StackName, ChangeSetName):
+        change_set = self.change_sets.get((StackName, ChangeSetName))
+        if change_set is None:
+            raise FakeError('ChangeSetNotFound', 'ChangeSet [%s] does not exist' % ChangeSetName, 404)
+        return change_set
+
+    def op_describe_change_set(self, StackName, ChangeSetName, NextToken = None):
+        change_set = self.__change_set(StackName, ChangeSetName)
+        response = dict((key, value) for key, value in change_set.items() if key != 'ChangeCount')
+
+        # Generate changes of the page. Large ChangeSets are not kept in memory.
+        start = int(NextToken or 0)
+        end = min(start + PAGE_SIZE, change_set['ChangeCount'])
+        response['Changes'] = [
+            {
+                'Type': 'Resource',
+                'ResourceChange': {
+                    'Action': ('Add', 'Modify', 'Remove')[i % 3],
+                    'LogicalResourceId': 'Resource%d' % i,
+                    'ResourceType': 'AWS::S3::Bucket',
+                    'Replacement': 'True' if i % 10 == 1 else 'False',
+                    'Scope': ['Properties'],
+                    'Details': []
+                }
+            }
+            for i in range(start, end)
+        ]
+        if end < change_set['ChangeCount']:
+            response['NextToken'] = str(end)
+        return response
+
+    def op_list_change_sets(self, StackName, NextToken = None):
+        self.__stack(StackName)
+        summaries = [
+            dict((key, value) for key, value in change_set.items() if key not in ('Parameters', 'ChangeCount'))
+            for (stack_name, _), change_set in self.change_sets.items() if stack_name == StackName
+        ]
+        return self.__page(summaries, 'Summaries', NextToken)
+
+    def op_delete_change_set(self, StackName, ChangeSetName):
+        self.change_sets.pop((StackName, ChangeSetName), None)
+        return {}
+
+    def op_execute_change_set(self, StackName, ChangeSetName, **kwargs):
+        change_set = self.__change_set(StackName, ChangeSetName)
+        stack = self.__stack(StackName)
+        stack['Parameters'] = change_set['Parameters']
+        stack['Tags'] = change_set['Tags']
+        self.__complete(stack, 'CREATE' if change_set['ChangeSetType'] == 'CREATE' else 'UPDATE')
+        # Other ChangeSets of the stack are deleted after execution.
+        for key in [key for key in self.change_sets.keys() if key[0] == StackName]:
+            del self.change_sets[key]
+        return {}
+
+    def op_detect_stack_drift(self, StackName, **kwargs):
+        stack = self.__stack(StackName)
+        detection_id = '%s-drift-%d' % (stack['StackName'], len(self.drift_detections))
+        count = min(self.drift_counts.get(stack['StackName'], 0), len(stack['Resources']))
+        self.drift_detections[detection_id] = {
+            'StackId': stack['StackId'],
+            'StackDriftDetectionId': detection_id,
+            'StackDriftStatus': 'DRIFTED' if count else 'IN_SYNC',
+            'DetectionStatus': 'DETECTION_COMPLETE',
+            'DriftedStackResourceCount': count,
+            'Timestamp': self.__tick(),
+            'Polls': 0
+        }
+        return {'StackDriftDetectionId': detection_id}
+
+    def op_describe_stack_drift_detection_status(self, StackDriftDetectionId):
+        detection = self.drift_detections.get(StackDriftDetectionId)
+        if detection is None:
+            raise FakeError('ValidationError', 'Drift detection %s does not exist' % StackDriftDetectionId)
+        detection['Polls'] += 1
+        if detection['Polls'] <= self.drift_detection_polls:
+            return {
+                'StackId': detection['StackId'],
+                'StackDriftDetectionId': StackDriftDetectionId,
+                'DetectionStatus': 'DETECTION_IN_PROGRESS',
+                'Timestamp': detection['Timestamp']
+            }
+        return dict((key, value) for key, value in detection.items() if key != 'Polls')
+
+    def op_describe_stack_resource_drifts(self, StackName, StackResourceDriftStatusFilters = None,
+                                          NextToken = None, MaxResults = PAGE_SIZE):
+        stack = self.__stack(StackName)
+        count = self.drift_counts.get(stack['StackName'], 0)
+        drifts = []
+        for i, resource in enumerate(stack['Resources']):
+            status = 'IN_SYNC' if i >= count else ('MODIFIED', 'DELETED')[i % 2]
+            if StackResourceDriftStatusFilters and status not in StackResourceDriftStatusFilters:
+                continue
+            drift = {
+                'StackId': stack['StackId'],
+                'LogicalResourceId': resource['LogicalResourceId'],
+                'PhysicalResourceId': resource['PhysicalResourceId'],
+                'ResourceType': resource['ResourceType'],
+                'StackResourceDriftStatus': status,
+                'Timestamp': self.clock
+            }
+            if status == 'MODIFIED':
+                drift['PropertyDifferences'] = [{
+                    'PropertyPath': '/VersioningConfiguration/Status',
+                    'ExpectedValue': 'Enabled',
+                    'ActualValue': 'Suspended',
+                    'DifferenceType': 'NOT_EQUAL'
+                }]
+            drifts.append(drift)
+        return self.__page(drifts, 'StackResourceDrifts', NextToken, page_size = MaxResults)
+
+    # ----- S3 -----
+
+    def op_head_object(self, Bucket, Key, **kwargs):
+        obj = self.objects.get((Bucket, Key))
+        if obj is None:
+            raise FakeError('404', 'Not Found', 404)
+        return {
+            'ETag': obj['ETag'],
+            'ContentLength': obj['Size'],
+            'LastModified': obj['LastModified'],
+            'Metadata': obj['Metadata']
+        }
+
+    def op_list_objects_v2(self, Bucket, Prefix = '', ContinuationToken = None, **kwargs):
+        contents = [
+            dict((key, value) for key, value in obj.items() if key != 'Metadata')
+            for (bucket, key), obj in self.objects.items() if bucket == Bucket and key.startswith(Prefix)
+        ]
+        page = self.__page(contents, 'Contents', ContinuationToken, 'NextContinuationToken', 1000)
+        page['IsTruncated'] = 'NextContinuationToken' in page
+        page['KeyCount'] = len(page['Contents'])
+        return page
+
+    def op_put_object(self, Bucket, Key, Body = b'', Metadata = None, **kwargs):
+        body = Body.read() if hasattr(Body, 'read') else Body
+        self.put_object(Bucket, Key, body, Metadata)
+        return {'ETag': self.objects[(Bucket, Key)]['ETag']}
+
+    def op_delete_objects(self, Bucket, Delete):
+        for obj in Delete['Objects']:
+            self.objects.pop((Bucket, obj['Key']), None)
+        return {'Deleted': [] if Delete.get('Quiet') else [{'Key': obj['Key']} for obj in Delete['Objects']]}
+
+
+    # ----- SSM -----
+
+    def op_get_parameters(self, Names, WithDecryption = False):
+        if len(Names) > 10:
+            raise FakeError('ValidationException', 'Member must have length less than or equal to 10')
+        return {
+            'Parameters': [
+                {'Name': name, 'Type': 'String', 'Value': self.ssm_parameters[name], 'Version': self.ssm_versions[name]}
+                for name in Names if name in self.ssm_parameters
+            ],
+            'InvalidParameters': [name for name in Names if name not in self.ssm_parameters]
+        }
+
+    def op_put_parameter(self, Name, Value, Type = 'String', Overwrite = False, **kwargs):
+        if Name in self.ssm_parameters and not Overwrite:
+            raise FakeError('ParameterAlreadyExists', 'The parameter already exists.')
+        self.put_parameter(Name, Value)
+        return {'Version': self.ssm_versions[Name]}
+
+    def op_delete_parameter(self, Name):
+        self.ssm_versions.pop(Name, None)
+        if self.ssm_parameters.pop(Name, None) is None:
+            raise FakeError('ParameterNotFound', 'Parameter %s not found.' % Name)
+        return {}
+
+
+class FakeClientPool(ClientPool):
+    """
+    ClientPool whose clients are answered by FakeAws.
+    """
+
+    def __init__(self, fake, **config):
+        super(FakeClientPool, self).__init__(**config)
+        self.fake = fake
+        self.attached = set()
+
+    def client(self, service_name, **target):
+        client = super(FakeClientPool, self).client(service_name, **target)
+        self.__attach(client)
+        return client
+
+    def resource(self, service_name, **target):
+        resource = super(FakeClientPool, self).resource(service_name, **target)
+        self.__attach(resource.meta.client)
+        return resource
+
+    def __attach(self, client):
+        with self.lock:
+            if id(client) not in self.attached:
+                self.fake.attach(client)
+                self.attached.add(id(client))
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Local caches.
+"""
+from collections import OrderedDict
+import json
+import os
+import threading
+
+
+class ContentCache(object):
+    """
+    Key-value cache keyed by content hash.
+    Kept in memory, and persisted to JSON file if path is specified. Least recently used entries are evicted.
+    """
+
+    def __init__(self, path = None, max_entries = 1000):
+        """
+        Create ContentCache.
+
+        :param path: JSON file path to persist. (OPTIONAL. Memory only if None)
+        :param max_entries: Max number of entries.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.dirty = False
+        if path is not None:
+            self.__load()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            value = self.entries.pop(key)
+            self.entries[key] = value  # Most recently used.
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = value
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last = False)
+            self.dirty = True
+
+    def save(self):
+        """
+        Persist entries to file. (Only if path is specified, and entries are changed)
+        """
+        with self.lock:
+            if self.path is None or not self.dirty:
+                return
+            cache_dir = os.path.dirname(self.path)
+            if cache_dir and not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            with open(self.path, 'w') as f:
+                json.dump(list(self.entries.items()), f)
+            self.dirty = False
+
+    def __load(self):
+        try:
+            with open(self.path) as f:
+                self.entries = OrderedDict((key, value) for key, value in json.load(f))
+        except (IOError, ValueError):
+            self.entries = OrderedDict()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Pool of boto3 sessions and clients.
+"""
+import threading
+
+from .lazy import LazyModule
+
+boto3 = LazyModule('boto3')
+botocore = LazyModule('botocore')
+
+
+# Default client configuration. Rate of requests is adapted by OperationRateLimiter, not by botocore adaptive mode.
+DEFAULT_CONFIG = dict(
+    max_pool_connections = 20,
+    connect_timeout = 10,
+    read_timeout = 60,
+    retries = {'max_attempts': 10, 'mode': 'standard'}
+)
+
+
+class ClientPool(object):
+    """
+    boto3 sessions, clients and resources shared per AWS target(profile, region, credentials).
+    Credentials and service models are resolved once per target, and connections are reused.
+    """
+
+    def __init__(self, **config):
+        """
+        Create ClientPool.
+
+        :param config: botocore Config arguments. (Override DEFAULT_CONFIG)
+        """
+        self.config_args = dict(DEFAULT_CONFIG, **config)
+        self.config = None
+        self.lock = threading.RLock()
+        self.sessions = {}
+        self.clients = {}
+        # Functions called with each client. (Like instrumentation)
+        self.listeners = []
+
+    def client_config(self):
+        with self.lock:
+            # botocore is imported when first client is created.
+            if self.config is None:
+                self.config = botocore.config.Config(**self.config_args)
+            return self.config
+
+    def session(self, profile = None, region = None, access_key_id = None, secret_access_key = None):
+        key = (profile, region, access_key_id, secret_access_key)
+        with self.lock:
+            if key not in self.sessions:
+                self.sessions[key] = boto3.session.Session(
+                    profile_name = profile,
+                    region_name = region,
+                    aws_access_key_id = access_key_id,
+                    aws_secret_access_key = secret_access_key
+                )
+            return self.sessions[key]
+
+    def client(self, service_name, **target):
+        """
+        Get shared client.
+
+        :param service_name: Service name. (Like cloudformation, s3)
+        :param target: AWS target. (profile, region, access_key_id, secret_access_key)
+        :return: Client.
+        """
+        key = ('client', service_name, tuple(sorted(target.items())))
+        with self.lock:
+            if key not in self.clients:
+                self.clients[key] = self.session(**target).client(service_name, config = self.client_config())
+                self.__notify(self.clients[key])
+            return self.clients[key]
+
+    def resource(self, service_name, **target):
+        """
+        Get shared resource.
+
+        :param service_name: Service name. (Like cloudformation)
+        :param target: AWS target. (profile, region, access_key_id, secret_access_key)
+        :return: Resource.
+        """
+        key = ('resource', service_name, tuple(sorted(target.items())))
+        with self.lock:
+            if key not in self.clients:
+                self.clients[key] = self.session(**target).resource(service_name, config = self.client_config())
+                self.__notify(self.clients[key].meta.client)
+            return self.clients[key]
+
+    def add_listener(self, listener):
+        """
+        Call function with existing and new clients.
+
+        :param listener: Function takes botocore client.
+        """
+        with self.lock:
+            self.listeners.append(listener)
+            for key, client in self.clients.items():
+                listener(client.meta.client if key[0] == 'resource' else client)
+
+    def __notify(self, client):
+        for listener in self.listeners:
+            listener(client)
@@ -1,20 +1,67 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
 from collections import OrderedDict
-from sets import Set
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import atexit
 import datetime
+import fnmatch
 import json
-
-import botocore
-import boto3
-from boto3.session import Session
+import os
+import sys
+import threading
+import time
 
 from fabric.api import *
 from fabric.operations import *
 from fabric.utils import *
 from fabric.colors import green, blue, yellow, red
 
-from prettytable import PrettyTable
+from .cache import ContentCache
+from .clients import ClientPool
+from .index import StackNameIndex, stack_name_from_id
+from .lazy import LazyModule
+from .output import OUTPUT_FORMATS, Table, TableWriter, RecordWriter
+from .params import SSM_BATCH_SIZE, parse_reference, load_params_file, chunks
+from .profiler import ApiProfiler, LATENCY_BUCKETS
+from .ratelimit import shared_rate_limiter
+from .snapshot import StackSnapshot, stack_fingerprint
+from .sync import TemplateSync
+from .templates import load_template, exported_names, imported_names, content_hash
+from .waiter import StackEventWaiter, MIN_DELAY, MAX_DELAY, TIMEOUT
+from .watch import StackWatcher
+
+# Heavy dependencies are imported on first use.
+botocore = LazyModule('botocore')
+prettytable = LazyModule('prettytable')
+
+# Max size of template passed by TemplateBody.
+TEMPLATE_BODY_LIMIT = 51200
+
+# Max rows of a change table. Large ChangeSets are rendered as multiple tables.
+CHANGE_TABLE_ROWS = 100
+
+# Number of latest events shown by desc_stack.
+DESC_STACK_EVENTS = 20
+
+# SSM parameter name prefix of fingerprint of template, parameters and stack arguments deployed. (Followed by stack name)
+# Not a stack tag, stack tags are propagated to all resources of stack.
+FINGERPRINT_PARAMETER_PREFIX = '/fabricawscfn/fingerprint/'
+
+# Error of list_resources for stack not created.
+STACK_NOT_EXISTS = 'Stack does not exists.'
+
+# Stack statuses except DELETE_COMPLETE.
+ACTIVE_STACK_STATUSES = [
+    'CREATE_IN_PROGRESS', 'CREATE_FAILED', 'CREATE_COMPLETE',
+    'ROLLBACK_IN_PROGRESS', 'ROLLBACK_FAILED', 'ROLLBACK_COMPLETE',
+    'DELETE_IN_PROGRESS', 'DELETE_FAILED', # 'DELETE_COMPLETE',
+    'UPDATE_IN_PROGRESS', 'UPDATE_COMPLETE_CLEANUP_IN_PROGRESS', 'UPDATE_COMPLETE',
+    'UPDATE_ROLLBACK_IN_PROGRESS', 'UPDATE_ROLLBACK_FAILED', 'UPDATE_ROLLBACK_COMPLETE_CLEANUP_IN_PROGRESS', 'UPDATE_ROLLBACK_COMPLETE',
+    'REVIEW_IN_PROGRESS'
+]
+
+# Serialize console output of concurrently executing stacks.
+_echo_lock = threading.RLock()
 
 
 def confirm(func):
@@ -40,6 +87,8 @@ def confirm(func):
             func(*args, **kwargs)
         else:
             abort(red('Canceled.'))
+    # Fabric shows arguments of original function by fab -d.
+    wrapper.wrapped = func
 
     return wrapper
 
@@ -59,10 +108,38 @@ class StackGroup(object):
         self.templates_s3_prefix = templates_s3_prefix
         self.templates_local_dir = templates_local_dir
         self.default_stack_args_ = {}
-
-        # boto3 client cache.
-        self.__cfn_client = None
-        self.__cfn_resource = None
+        self.max_workers_ = 4
+        self.cache_dir_ = '.fabricawscfn'
+
+        # boto3 clients shared per AWS target. All calls are rate limited per API operation.
+        self.client_pool = ClientPool()
+        self.rate_limiter = shared_rate_limiter()
+        self.client_pool.add_listener(self.rate_limiter.attach)
+        # AWS target queried by current thread.
+        self.__local = threading.local()
+        # Instrumentation of AWS API calls and tasks. (Enabled by api_stats task)
+        self.profiler = ApiProfiler()
+        # Set by Ctrl+C while executing stacks concurrently. Stops waiters of workers.
+        self.interrupted = threading.Event()
+
+        # Local caches.
+        self.__validation_cache = None
+        self.__template_summary_cache = None
+        self.__template_etags = {}
+        self.inline_templates_ = False
+        # Keys of templates uploaded by content hash.
+        self.__uploaded_contents = set()
+        self.persist_template_summaries_ = False
+        self.snapshot_ttl_ = None
+        self.skip_unchanged_ = False
+        self.__snapshots = {}
+        self.__snapshot_lock = threading.Lock()
+
+        # Parameter files, and values of {{ssm:...}}, {{output:...}} references fetched. (And versions of SSM parameters)
+        self.params_files_ = []
+        self.__loaded_params_files = {}
+        self.__references = {}
+        self.__reference_versions = {}
 
         # Task execute confirm.
         env.NeedConfirm = False
@@ -74,8 +151,7 @@ class StackGroup(object):
             wrapper = task(name = task_name, alias = task_alias)
         else:
             wrapper = task(name = task_name)
-        rand = '%d' % (time.time() * 100000)
-        namespace['task_%s_%s' % (task_name, rand)] = wrapper(task_method)
+        namespace['task_%s' % task_name] = wrapper(self.profiler.task(task_name, task_method))
 
     def need_confirm(self, confirm_message):
         env.NeedConfirm = True
@@ -122,26 +198,114 @@ class StackGroup(object):
         self.default_stack_args_ = kwargs
         return self
 
-    def define_stack(self, alias, stack_name, template_path, **kwargs):
+    def max_workers(self, max_workers):
+        """
+        Set max number of stacks processed concurrently. (Bulk tasks, list_resources)
+        Can override by workers task.
+
+        :param max_workers: Max workers. (Default 4)
+        :return: self
+        """
+        self.max_workers_ = max_workers
+        return self
+
+    def rate_limit(self, operation_name, rate, service_name = 'cloudformation'):
+        """
+        Set initial requests per second of AWS API operation. (Shared in process)
+        Rate is halved when throttled, and increases slowly up to 4 times of initial rate while not throttled.
+
+        :param operation_name: Operation name. (Like CreateChangeSet, DescribeStacks)
+        :param rate: Requests per second.
+        :param service_name: Service name. (Default cloudformation)
+        :return: self
+        """
+        self.rate_limiter.set_rate(service_name, operation_name, rate)
+        return self
+
+    def cache_dir(self, cache_dir):
+        """
+        Set local dir for caches. (Template hashes, ...)
+
+        :param cache_dir: Cache dir. (Default .fabricawscfn)
+        :return: self
+        """
+        self.cache_dir_ = cache_dir
+        return self
+
+    def persist_template_summaries(self, persist = True):
+        """
+        Persist cache of template summaries to cache dir. (Default only in memory)
+
+        :param persist: Persist or not.
+        :return: self
+        """
+        self.persist_template_summaries_ = persist
+        self.__template_summary_cache = None
+        return self
+
+    def inline_templates(self, inline = True):
+        """
+        Pass local templates by TemplateBody, instead of templates synchronized to S3. (sync_templates is not needed)
+        Templates larger than TEMPLATE_BODY_LIMIT are uploaded to S3 by content hash. (Only the template)
+        Override per stack by define_stack(inline_template = ...).
+
+        :param inline: Inline or not.
+        :return: self
+        """
+        self.inline_templates_ = inline
+        return self
+
+    def snapshot_ttl(self, ttl):
+        """
+        Enable local snapshot of stack state used by list_stacks, desc_stack and list_resources.
+
+        :param ttl: Seconds stack summaries in snapshot are valid. (None to disable. Default disabled)
+        :return: self
+        """
+        self.snapshot_ttl_ = ttl
+        return self
+
+    def skip_unchanged(self, enabled = True):
+        """
+        Save fingerprint of template, parameters and stack arguments deployed to SSM parameter,
+        and skip updating stacks not changed since then. (Needs ssm:GetParameters, ssm:PutParameter, ssm:DeleteParameter)
+
+        :param enabled: Enabled or not. (Default disabled)
+        :return: self
+        """
+        self.skip_unchanged_ = enabled
+        return self
+
+    def cache_path(self, file_name):
+        return os.path.join(self.cache_dir_, file_name)
+
+    def actual_max_workers(self):
+        return max(1, int(env.get('MaxWorkers', self.max_workers_)))
+
+    def define_stack(self, alias, stack_name, template_path, depends_on = None, inline_template = None, **kwargs):
         """
         Define stack.
 
         :param alias: Stack alias.
         :param stack_name: Stack name.(allow placeholder. will be replace by env.)
         :param template_path: Template file relative path.
+        :param depends_on: Aliases of stacks this stack depends on.(OPTIONAL. Export/Fn::ImportValue dependencies are resolved from templates)
+        :param inline_template: Pass local template by TemplateBody or not.(OPTIONAL. Default StackGroup#inline_templates())
         :param kwargs: Optional stack arguments.
         :return: self
         """
-        stack_def = StackDef(self, alias, stack_name, template_path, **kwargs)
+        stack_def = StackDef(self, alias, stack_name, template_path, depends_on, inline_template, **kwargs)
         self.stack_defs[alias] = stack_def
 
         return self
 
-    def generate_task(self, namespace):
+    def generate_task(self, namespace, stack_tasks = True):
         """
         Generate Fabric task for defined Stack(s).
 
         :param namespace: Task add to.
+        :param stack_tasks: Set False to not generate create_xxx, update_xxx, delete_xxx tasks for each stack.
+                            Use create:xxx, update:xxx, delete:xxx instead. (Faster startup for many stacks)
         :return: self
         """
         # Add general tasks.
@@ -149,57 +313,275 @@ class StackGroup(object):
         self.__add_fabric_task(namespace, 'region', self.region, 'r')
         self.__add_fabric_task(namespace, 'account', self.account, 'a')
         self.__add_fabric_task(namespace, 'force', self.force)
+        self.__add_fabric_task(namespace, 'force_update', self.force_update)
+        self.__add_fabric_task(namespace, 'workers', self.workers, 'w')
+        self.__add_fabric_task(namespace, 'targets', self.targets, 't')
+        self.__add_fabric_task(namespace, 'refresh', self.refresh)
+        self.__add_fabric_task(namespace, 'output', self.output, 'o')
+        self.__add_fabric_task(namespace, 'api_stats', self.api_stats)
         self.__add_fabric_task(namespace, 'params', self.params, 'pm')
+        self.__add_fabric_task(namespace, 'params_file', self.params_file, 'pf')
         self.__add_fabric_task(namespace, 'console', self.console, 'c')
         self.__add_fabric_task(namespace, 'validate_template', self.validate_template, 'vt')
+        self.__add_fabric_task(namespace, 'validate_all', self.validate_all, 'va')
         self.__add_fabric_task(namespace, 'sync_templates', self.sync_templates, 'st')
         self.__add_fabric_task(namespace, 'list_stacks', self.list_stacks, 'ls')
         self.__add_fabric_task(namespace, 'desc_stack', self.desc_stack, 'ds')
         self.__add_fabric_task(namespace, 'list_resources', self.list_resources, 'lr')
         self.__add_fabric_task(namespace, 'list_exports', self.list_exports, 'le')
+        self.__add_fabric_task(namespace, 'watch', self.watch)
         self.__add_fabric_task(namespace, 'dryrun', self.dryrun, 'd')
+        self.__add_fabric_task(namespace, 'create_all', self.create_all)
+        self.__add_fabric_task(namespace, 'update_all', self.update_all)
+        self.__add_fabric_task(namespace, 'delete_all', self.delete_all)
+        self.__add_fabric_task(namespace, 'dryrun_all', self.dryrun_all, 'da')
+        self.__add_fabric_task(namespace, 'detect_drift', self.detect_drift, 'dd')
+
+        self.__add_fabric_task(namespace, 'create', self.create)
+        self.__add_fabric_task(namespace, 'update', self.update)
+        self.__add_fabric_task(namespace, 'delete', self.delete)
 
         # Add stack tasks.
-        for stack_def in self.stack_defs.values():
-            for operation in stack_def.get_stack_operations():
-                operation_name = operation.__name__
-                operation.__func__.__doc__ = '%s stack %s.' % (operation_name, stack_def.stack_alias)
-                task_name = '%s_%s' % (operation_name, stack_def.stack_alias)
-                self.__add_fabric_task(namespace, task_name, operation)
+        if stack_tasks:
+            general_tasks = set(key for key in namespace.keys() if key.startswith('task_'))
+            for stack_def in self.stack_defs.values():
+                for operation in stack_def.get_stack_operations():
+                    task_name = '%s_%s' % (operation.__name__, stack_def.stack_alias)
+                    # Stack task must not replace general task. (Like create_all by stack alias 'all')
+                    if 'task_%s' % task_name in general_tasks:
+                        abort(red('Stack alias %s conflicts with task %s. Use other alias.' % (
+                            stack_def.stack_alias, task_name
+                        )))
+                    self.__add_fabric_task(namespace, task_name, self.__stack_task(operation, stack_def))
+
+        return self
+
+    def __stack_task(self, operation, stack_def):
+        def stack_task(*args, **kwargs):
+            return operation(*args, **kwargs)
+        stack_task.__doc__ = '%s stack %s.' % (operation.__name__, stack_def.stack_alias)
+        # Fabric shows arguments of original function by fab -d.
+        stack_task.wrapped = operation
+        return stack_task
+
+    def stack_def(self, alias):
+        """
+        Get defined stack.
+
+        :param alias: Stack alias.
+        :return: StackDef.
+        """
+        if not self.stack_defs.has_key(alias):
+            abort(red('Stack %s is not defined. (Defined stacks: %s)' % (alias, ', '.join(self.stack_defs.keys()))))
+        return self.stack_defs[alias]
+
+    def create(self, alias, **kwparams):
+        """
+        Create stack. (Like create:xxx)
+
+        :param alias: Stack alias.
+        :param kwparams: Stack parameters.
+        """
+        self.stack_def(alias).create(**kwparams)
+
+    def update(self, alias, **kwparams):
+        """
+        Update stack. (Like update:xxx)
 
+        :param alias: Stack alias.
+        :param kwparams: Stack parameters.
+        """
+        self.stack_def(alias).update(**kwparams)
+
+    def delete(self, alias):
+        """
+        Delete stack. (Like delete:xxx)
+
+        :param alias: Stack alias.
+        """
+        self.stack_def(alias).delete()
+
+    def client_config(self, **kwargs):
+        """
+        Set botocore client configuration. (Like max_pool_connections, retries, connect_timeout, read_timeout)
+
+        :param kwargs: botocore.config.Config arguments.
+        :return: self
+        """
+        listeners = self.client_pool.listeners
+        self.client_pool = ClientPool(**kwargs)
+        for listener in listeners:
+            self.client_pool.add_listener(listener)
         return self
 
+    def aws_target(self):
+        # Target of fan-out query by targets task.
+        target = getattr(self.__local, 'target', None)
+        if target is not None:
+            return dict(target)
+        return dict(
+            profile = env.get('Profile'),
+            region = env.get('Region'),
+            access_key_id = env.get('AccessKeyId'),
+            secret_access_key = env.get('SecretAccessKey')
+        )
+
     def cfn_client(self):
-        if self.__cfn_client is None:
-            session = Session(
-                profile_name = env.get('Profile'),
-                region_name = env.get('Region'),
-                aws_access_key_id = env.get('AccessKeyId'),
-                aws_secret_access_key = env.get('SecretAccessKey')
+        return self.client_pool.client('cloudformation', **self.aws_target())
+
+    def ssm_client(self):
+        return self.client_pool.client('ssm', **self.aws_target())
+
+    def deployed_fingerprints(self, stack_names):
+        """
+        Get fingerprints of deployed stacks from SSM parameters, by GetParameters of 10 names concurrently.
+
+        :param stack_names: Stack names.
+        :return: {Stack name, Fingerprint} (Stacks without fingerprint are not included. Empty if disabled or force_update)
+        """
+        if not self.skip_unchanged_ or env.get('ForceUpdate'):
+            return {}
+
+        def fetch(names):
+            try:
+                response = self.ssm_client().get_parameters(
+                    Names = [FINGERPRINT_PARAMETER_PREFIX + stack_name for stack_name in names]
+                )
+            except botocore.exceptions.ClientError:
+                # Not permitted. Stacks are updated as usual.
+                return {}
+            return dict(
+                (param['Name'][len(FINGERPRINT_PARAMETER_PREFIX):], param['Value']) for param in response['Parameters']
             )
-            self.__cfn_client = session.client('cloudformation')
-        return self.__cfn_client
+
+        fingerprints = {}
+        for fetched in self.map_concurrently(fetch, chunks(list(stack_names), SSM_BATCH_SIZE)):
+            fingerprints.update(fetched)
+        return fingerprints
+
+    def unchanged_stacks(self, targets, fingerprints):
+        """
+        Find stacks deployed with same fingerprint before getting template summaries.
+        Parameters of templates are taken from existing stacks. (Same as templates if fingerprints match)
+
+        :param targets: List of (StackDef, Existing stack description)
+        :param fingerprints: Deployed fingerprints. (Result of deployed_fingerprints)
+        :return: Set of stack aliases not changed.
+        """
+        checking = []
+        for stack_def, stack in targets:
+            template = stack_def.deployed_template(stack)
+            # Parameters to prompt are checked after resolving them by template summary.
+            if stack['StackName'] in fingerprints and (
+                    env.abort_on_prompts
+                    or len(stack_def.specified_params(template)) == len(template['Parameters'])):
+                checking.append((stack_def, template, stack))
+        resolved = self.resolve_all_params([
+            (stack_def, template, stack.get('Parameters', [])) for stack_def, template, stack in checking
+        ])
+        return set(
+            stack_def.stack_alias for (stack_def, _, stack), stack_params in zip(checking, resolved)
+            if stack_def.unchanged(stack, stack_params, fingerprints)
+        )
 
     def cfn_resource(self):
-        if self.__cfn_resource is None:
-            session = Session(
-                profile_name = env.get('Profile'),
-                region_name = env.get('Region'),
-                aws_access_key_id = env.get('AccessKeyId'),
-                aws_secret_access_key = env.get('SecretAccessKey')
-            )
-            self.__cfn_resource = session.resource('cloudformation')
-        return self.__cfn_resource
+        return self.client_pool.resource('cloudformation', **self.aws_target())
+
+    def s3_client(self):
+        return self.client_pool.client('s3', **self.aws_target())
+
+    def snapshot(self):
+        """
+        Get snapshot of stack state on current AWS target and defined stacks.
+
+        :return: StackSnapshot, or None if disabled.
+        """
+        if self.snapshot_ttl_ is None:
+            return None
+        key = content_hash(json.dumps([
+            sorted(self.aws_target().items()),
+            sorted(stack_def.actual_stack_name() for stack_def in self.stack_defs.values())
+        ]).encode('utf-8'))[:16]
+        with self.__snapshot_lock:
+            if key not in self.__snapshots:
+                self.__snapshots[key] = StackSnapshot(self.cache_path('snapshot-%s.json' % key), self.snapshot_ttl_)
+            return self.__snapshots[key]
+
+    def invalidate_snapshot(self, stack_name):
+        snapshot = self.snapshot()
+        if snapshot is not None:
+            snapshot.invalidate(stack_name)
+            snapshot.save()
+
+    def api_stats(self, trace = None):
+        """
+        Show statistics of AWS API calls and tasks at the end of run.
+
+        :param trace: File path to write timeline as Chrome trace JSON. (OPTIONAL)
+        """
+        if not self.profiler.enabled:
+            self.profiler.enable(trace)
+            self.client_pool.add_listener(self.profiler.attach)
+            atexit.register(self.print_api_stats)
+        return self
+
+    def print_api_stats(self):
+        profiler = self.profiler
+        rows = []
+        for (service, operation), stats in profiler.operations.items():
+            rows.append([
+                service,
+                operation,
+                stats.calls,
+                stats.errors,
+                stats.retries,
+                stats.throttles,
+                '%.2f' % stats.total,
+                '%.1f' % (stats.total * 1000 / stats.calls),
+                '%.0f' % stats.percentile(0.5),
+                '%.0f' % stats.percentile(0.9),
+                '%.1f' % (stats.max * 1000)
+            ])
+        self.print_table(
+            'API calls:',
+            ['Service', 'Operation', 'Calls', 'Errors', 'Retries', 'Throttles', 'Total(s)', 'Avg(ms)', 'p50(ms)', 'p90(ms)', 'Max(ms)'],
+            rows,
+            ['Service', 'Operation']
+        )
+
+        bucket_columns = ['<=%dms' % bound for bound in LATENCY_BUCKETS] + ['>%dms' % LATENCY_BUCKETS[-1]]
+        self.print_table(
+            'Latency histogram:',
+            ['Operation'] + bucket_columns,
+            [[operation] + stats.histogram for (_, operation), stats in profiler.operations.items()],
+            ['Operation']
+        )
+
+        self.print_table(
+            'Tasks:',
+            ['Task', 'Elapsed(s)'],
+            [[task_name, '%.2f' % elapsed] for task_name, elapsed in profiler.tasks],
+            ['Task']
+        )
+
+        if profiler.trace_path is not None:
+            profiler.save_trace()
+            print('Timeline written to %s. (Open by chrome://tracing)' % profiler.trace_path)
+
+    def refresh(self):
+        """
+        Ignore snapshot of stack state, and fetch latest stack state.
+        """
+        env.RefreshSnapshot = True
+        return self
 
     def profile(self, profile):
         """
         Set AWS Profile. (Default use AWS credentials default profile)
         :param profile: Profile name.
         """
-        print(green('Use AWS Profile is %s.' % profile, bold = True))
+        self.notice(green('Use AWS Profile is %s.' % profile, bold = True))
         env.Profile = profile
-        self.__cfn_client = None
-        self.__cfn_resource = None
 
         return self
 
@@ -209,10 +591,8 @@ class StackGroup(object):
 
         :param region: AWS region.
         """
-        print(green('Use AWS Region is %s.' % region, bold = True))
+        self.notice(green('Use AWS Region is %s.' % region, bold = True))
         env.Region = region
-        self.__cfn_client = None
-        self.__cfn_resource = None
 
         return self
 
@@ -225,8 +605,6 @@ class StackGroup(object):
         """
         env.AccessKeyId = access_key_id
         env.SecretAccessKey = secret_access_key
-        self.__cfn_client = None
-        self.__cfn_resource = None
 
         return self
 
@@ -237,6 +615,22 @@ class StackGroup(object):
         env.Confirmed = True
         return self
 
+    def force_update(self):
+        """
+        Update stacks deployed with same fingerprint too.
+        """
+        env.ForceUpdate = True
+        return self
+
+    def workers(self, max_workers):
+        """
+        Set max number of stacks processed concurrently. (Bulk tasks, list_resources)
+
+        :param max_workers: Max workers.
+        """
+        env.MaxWorkers = int(max_workers)
+        return self
+
     def params(self, **kwparams):
         """
         Set parameters. (Applies to all tasks)
@@ -248,16 +642,283 @@ class StackGroup(object):
 
         return self
 
+    def params_file(self, *paths):
+        """
+        Load parameters from files(YAML or JSON). Later files override earlier ones, and parameters task overrides files.
+        Values can refer SSM parameter by {{ssm:NAME}}, or stack output by {{output:STACK.OUTPUT_KEY}}.
+
+        :param paths: File paths. (allow placeholder. will be replace by env. Like params/%(EnvName)s.yaml)
+        """
+        self.params_files_.extend(paths)
+
+        return self
+
+    def file_params(self, stack_alias):
+        """
+        Parameters of stack in parameter files.
+
+        :param stack_alias: Stack alias.
+        :return: {Parameter key, Value}
+        """
+        params = {}
+        for path in self.params_files_:
+            actual_path = path % env
+            if actual_path not in self.__loaded_params_files:
+                if not os.path.isfile(actual_path):
+                    abort(red('Parameter file %s does not exists.' % actual_path))
+                try:
+                    self.__loaded_params_files[actual_path] = load_params_file(actual_path)
+                except ValueError as e:
+                    abort(red('Invalid parameter file %s. %s' % (actual_path, e)))
+            common, stacks = self.__loaded_params_files[actual_path]
+            params.update(common)
+            params.update(stacks.get(stack_alias, {}))
+        return params
+
+    def prefetch_references(self, values):
+        """
+        Fetch all SSM parameters and stack outputs referred by parameter values at once.
+        SSM parameters are fetched by GetParameters of 10 names, and outputs by a DescribeStacks per stack.
+        Fetched values are cached.
+
+        :param values: Parameter values.
+        """
+        references = set(parse_reference(value) for value in values)
+        references.discard(None)
+        references = sorted(reference for reference in references if reference not in self.__references)
+        if not references:
+            return
+
+        ssm_names = [name for kind, name in references if kind == 'ssm']
+        # {Stack name, [(Stack alias or name referred, Output key)]}
+        output_refs = OrderedDict()
+        for kind, name in references:
+            if kind == 'output':
+                stack_ref, _, output_key = name.partition('.')
+                stack_name = self.stack_defs[stack_ref].actual_stack_name() if stack_ref in self.stack_defs else stack_ref
+                output_refs.setdefault(stack_name, []).append((name, output_key))
+
+        def fetch(request):
+            kind, key = request
+            if kind == 'ssm':
+                response = self.ssm_client().get_parameters(Names = key, WithDecryption = True)
+                return (
+                    dict((('ssm', param['Name']), param['Value']) for param in response['Parameters']),
+                    dict((('ssm', param['Name']), param['Version']) for param in response['Parameters'])
+                )
+            try:
+                stack = self.cfn_client().describe_stacks(StackName = key)['Stacks'][0]
+            except botocore.exceptions.ClientError:
+                # Stack does not exists
+                return {}, {}
+            outputs = dict((output['OutputKey'], output['OutputValue']) for output in stack.get('Outputs', []))
+            return dict(
+                (('output', name), outputs[output_key]) for name, output_key in output_refs[key] if output_key in outputs
+            ), {}
+
+        requests = [('ssm', names) for names in chunks(ssm_names, SSM_BATCH_SIZE)]
+        requests += [('output', stack_name) for stack_name in output_refs.keys()]
+        print('Fetching %d parameter reference(s) with %d call(s)...' % (len(references), len(requests)))
+        for fetched, versions in self.map_concurrently(fetch, requests):
+            self.__references.update(fetched)
+            self.__reference_versions.update(versions)
+
+        missing = [reference for reference in references if reference not in self.__references]
+        if missing:
+            abort(red('Failed to resolve %s.' % ', '.join('{{%s:%s}}' % reference for reference in missing)))
+
+    def resolve_reference(self, value):
+        """
+        Resolve parameter value referring SSM parameter or stack output.
+
+        :param value: Parameter value.
+        :return: Referred value, or value as is if not a reference.
+        """
+        reference = parse_reference(value)
+        if reference is None:
+            return value
+        self.prefetch_references([value])
+        return self.__references[reference]
+
+    def reference_version(self, value):
+        """
+        Identify value of SSM parameter referred without the value itself.
+
+        :param value: Parameter value referring SSM parameter.
+        :return: Reference and version of SSM parameter. (Like {{ssm:/prod/password}}@3)
+        """
+        reference = parse_reference(value)
+        self.prefetch_references([value])
+        return '{{%s:%s}}@%s' % (reference[0], reference[1], self.__reference_versions[reference])
+
+    def resolve_all_params(self, targets):
+        """
+        Resolve parameters of stacks before any mutation.
+        References of all stacks are prefetched at once.
+
+        :param targets: List of (StackDef, Template summary, Parameters of existing stack or None)
+        :return: List of stack parameters.
+        """
+        self.prefetch_references(
+            value
+            for stack_def, template, _ in targets
+            for value in stack_def.specified_params(template).values()
+        )
+        return [
+            stack_def.resolve_params(template, previous_params) for stack_def, template, previous_params in targets
+        ]
+
     def console(self):
         """
         Open AWS Console on your default Web browser.
         """
         import webbrowser
-        session = boto3.session.Session()
+        session = self.client_pool.session(**self.aws_target())
         webbrowser.open('https://%(region)s.console.aws.amazon.com/cloudformation/home?region=%(region)s#/stacks?filter=active' % dict(
             region = session.region_name
         ))
 
+    def template_local_path(self, template_path):
+        return '%s/%s' % (self.templates_local_dir, template_path)
+
+    def template_s3_url(self, template_path):
+        return 'https://s3.amazonaws.com/%s/%s/%s' % (
+            self.actual_templates_s3_bucket(),
+            self.actual_templates_s3_prefix(),
+            template_path
+        )
+
+    def template_s3_key(self, template_path):
+        return '%s/%s' % (self.actual_templates_s3_prefix(), template_path)
+
+    def template_body(self, template_path):
+        with open(self.template_local_path(template_path), 'rb') as f:
+            return f.read()
+
+    def upload_template_content(self, template_path, body):
+        """
+        Upload template to S3 key identified by its content hash. Skip if already uploaded.
+
+        :param template_path: Template file relative path.
+        :param body: Template content. (bytes)
+        :return: Template URL.
+        """
+        digest = content_hash(body)
+        # Hidden dir is not synchronized(nor deleted) by sync_templates.
+        key = '%s/.content/%s/%s' % (self.actual_templates_s3_prefix(), digest, os.path.basename(template_path))
+        if key not in self.__uploaded_contents:
+            try:
+                self.s3_client().head_object(Bucket = self.actual_templates_s3_bucket(), Key = key)
+            except botocore.exceptions.ClientError:
+                print('Uploading template %s to s3://%s/%s...' % (template_path, self.actual_templates_s3_bucket(), key))
+                self.s3_client().put_object(
+                    Bucket = self.actual_templates_s3_bucket(),
+                    Key = key,
+                    Body = body,
+                    Metadata = {'sha256': digest}
+                )
+            self.__uploaded_contents.add(key)
+        return 'https://s3.amazonaws.com/%s/%s' % (self.actual_templates_s3_bucket(), key)
+
+    def template_args(self, template_path, inline = False):
+        """
+        Arguments of API passing template.
+
+        :param template_path: Template file relative path.
+        :param inline: Pass local template by TemplateBody. (Uploaded by content hash if too large)
+        :return: {TemplateBody: Content} or {TemplateURL: URL}
+        """
+        if not inline:
+            return {'TemplateURL': self.template_s3_url(template_path)}
+        body = self.template_body(template_path)
+        if len(body) <= TEMPLATE_BODY_LIMIT:
+            return {'TemplateBody': body.decode('utf-8')}
+        return {'TemplateURL': self.upload_template_content(template_path, body)}
+
+    def template_version(self, template_path, inline = False):
+        """
+        Identify content of template.
+
+        :param template_path: Template file relative path.
+        :param inline: Identify local template instead of synchronized template.
+        :return: etag:ETag or sha256:Hash, or None if template is not synchronized.
+        """
+        if inline:
+            return 'sha256:%s' % content_hash(self.template_body(template_path))
+        etag = self.template_etag(template_path)
+        return 'etag:%s' % etag if etag is not None else None
+
+    def template_summary_cache(self):
+        if self.__template_summary_cache is None:
+            self.__template_summary_cache = ContentCache(
+                self.cache_path('template-summary-cache.json') if self.persist_template_summaries_ else None
+            )
+        return self.__template_summary_cache
+
+    def template_etag(self, template_path):
+        """
+        Get ETag of synchronized template.
+
+        :param template_path: Template file relative path.
+        :return: ETag, or None if template is not found.
+        """
+        # Cached until templates are synchronized. (Fingerprints and template summaries of a stack share it)
+        key = (self.actual_templates_s3_bucket(), self.template_s3_key(template_path))
+        if key not in self.__template_etags:
+            try:
+                head = self.s3_client().head_object(Bucket = key[0], Key = key[1])
+            except botocore.exceptions.ClientError:
+                self.__template_etags[key] = None
+            else:
+                self.__template_etags[key] = head['ETag'].strip('"')
+        return self.__template_etags[key]
+
+    def template_summary(self, template_path, inline = False):
+        """
+        Get template summary of synchronized template, or local template if inline.
+        Cached by ETag or hash of template, so unchanged template is not summarized again.
+
+        :param template_path: Template file relative path.
+        :param inline: Summarize local template.
+        :return: Template summary.
+        """
+        # Can not identify template content if no ETag. Don't use cache.
+        key = self.template_version(template_path, inline)
+
+        summary = self.template_summary_cache().get(key) if key is not None else None
+        if summary is None:
+            summary = self.cfn_client().get_template_summary(**self.template_args(template_path, inline))
+            summary.pop('ResponseMetadata', None)
+            if key is not None:
+                self.template_summary_cache().put(key, summary)
+                self.template_summary_cache().save()
+        return summary
+
+    def validation_cache(self):
+        if self.__validation_cache is None:
+            self.__validation_cache = ContentCache(self.cache_path('validation-cache.json'))
+        return self.__validation_cache
+
+    def __validate_template(self, template_path):
+        # Validate template, or use cached result of same content.
+        body = self.template_body(template_path)
+        key = content_hash(body)
+        result = self.validation_cache().get(key)
+        if result is not None:
+            return result, True
+
+        if len(body) <= TEMPLATE_BODY_LIMIT:
+            result = self.cfn_client().validate_template(TemplateBody = body.decode('utf-8'))
+        else:
+            # Too large for TemplateBody. Validate local content uploaded by its hash,
+            # synchronized template may be stale.
+            result = self.cfn_client().validate_template(
+                TemplateURL = self.upload_template_content(template_path, body)
+            )
+        result.pop('ResponseMetadata', None)
+        self.validation_cache().put(key, result)
+        return result, False
+
     def validate_template(self, alias_or_template_path):
         """
         Validate template on local dir.
@@ -269,14 +930,67 @@ class StackGroup(object):
         else:
             template_path = alias_or_template_path
 
-        template_local_path = '%s/%s' % (
-            self.templates_local_dir,
-            template_path
-        )
-        print('Validating template %s...' % template_local_path)
-        local(
-            "aws cloudformation validate-template --template-body file://%s --output table" % template_local_path
-        )
+        print('Validating template %s...' % self.template_local_path(template_path))
+        try:
+            result, cached = self.__validate_template(template_path)
+        except botocore.exceptions.ClientError as e:
+            abort(red(e.response['Error']['Message']))
+        finally:
+            self.validation_cache().save()
+
+        print(green('Valid%s.' % (' (cached)' if cached else '')))
+        print(blue('Description:', bold = True))
+        print(result.get('Description', '-'))
+        print(blue('Parameters:', bold = True))
+        table = prettytable.PrettyTable(['Key', 'DefaultValue', 'NoEcho', 'Description'])
+        table.align['Key'] = 'l'
+        table.align['DefaultValue'] = 'l'
+        table.align['Description'] = 'l'
+        for param in result.get('Parameters', []):
+            table.add_row([
+                param['ParameterKey'],
+                param.get('DefaultValue', '-'),
+                param.get('NoEcho', False),
+                self.shorten(param.get('Description', '-'), 70, 0)
+            ])
+        print(table)
+        if result.get('Capabilities'):
+            print(blue('Capabilities:', bold = True))
+            print('%s - %s' % (', '.join(result['Capabilities']), result.get('CapabilitiesReason', '')))
+
+    def validate_all(self):
+        """
+        Validate templates of all defined stacks concurrently. (Unchanged templates are not validated again)
+        """
+        template_paths = list(OrderedDict(
+            (stack_def.template_path, None) for stack_def in self.stack_defs.values()
+        ).keys())
+
+        def validate(template_path):
+            try:
+                result, cached = self.__validate_template(template_path)
+            except botocore.exceptions.ClientError as e:
+                return False, red(e.response['Error']['Message'])
+            except IOError as e:
+                return False, red('%s' % e)
+            return True, green('Valid (cached)' if cached else 'Valid')
+
+        print('Validating %d template(s)...' % len(template_paths))
+        try:
+            results = self.map_concurrently(validate, template_paths)
+        finally:
+            self.validation_cache().save()
+
+        table = prettytable.PrettyTable(['Template', 'Result'])
+        table.align['Template'] = 'l'
+        table.align['Result'] = 'l'
+        for template_path, (valid, message) in zip(template_paths, results):
+            table.add_row([template_path, message])
+        print(blue('Templates:', bold = True))
+        print(table)
+
+        if not all(valid for valid, _ in results):
+            abort(red('Invalid template(s) found.'))
 
     @confirm
     def sync_templates(self):
@@ -285,264 +999,1111 @@ class StackGroup(object):
         """
         s3url = 's3://%s/%s' % (self.actual_templates_s3_bucket(), self.actual_templates_s3_prefix())
         print('Synchronizing templates local %s to %s...' % (self.templates_local_dir, s3url))
-        local('aws s3 sync %s %s --delete --exclude "*" --include \"*.yaml\"' % (self.templates_local_dir, s3url))
+        result = TemplateSync(
+            self.s3_client(),
+            self.actual_templates_s3_bucket(),
+            self.actual_templates_s3_prefix(),
+            self.templates_local_dir,
+            self.cache_path('sync-manifest.json'),
+            max_workers = self.actual_max_workers()
+        ).sync(dryrun = self.in_dryrun(), echo = print)
+        self.__template_etags.clear()
+        print('%d uploaded (%d bytes), %d deleted, %d unchanged (%d bytes skipped) in %.2fs.' % (
+            result['uploaded'],
+            result['uploaded_bytes'],
+            result['deleted'],
+            result['unchanged'],
+            result['unchanged_bytes'],
+            result['elapsed']
+        ))
+
+    def stack_name_index(self):
+        index = StackNameIndex()
+        for stack_def in self.stack_defs.values():
+            index.add(stack_def.actual_stack_name(), stack_def.stack_alias)
+        return index
+
+    def iter_stack_summaries(self, index = None):
+        """
+        Iterate summaries of stacks in stack group. (Including chained stacks)
+        Use snapshot while it is not expired.
+
+        :param index: StackNameIndex of defined stacks. (OPTIONAL)
+        :return: Iterator of stack summaries.
+        """
+        index = index or self.stack_name_index()
+        snapshot = self.snapshot()
+        if snapshot is not None and not env.get('RefreshSnapshot'):
+            cached = snapshot.summaries()
+            if cached is not None:
+                for summary in cached:
+                    yield summary
+                return
+
+        summaries = []
+        paginator = self.cfn_client().get_paginator('list_stacks')
+        for page in paginator.paginate(StackStatusFilter = ACTIVE_STACK_STATUSES):
+            for summary in page['StackSummaries']:
+                if index.lookup(summary['StackName']) is not None:
+                    if snapshot is not None:
+                        summaries.append(summary)
+                    yield summary
+
+        if snapshot is not None:
+            snapshot.put_summaries(summaries)
+            snapshot.save()
+
+    def __stack_fingerprints(self, stack_names, described = None):
+        """
+        Fingerprints of stacks to check snapshot is valid. Taken from stack summaries not expired,
+        or by a DescribeStacks per stack. (Sweeping all stacks of account costs more than it)
+
+        :param stack_names: Stack names.
+        :param described: Dict to put stack descriptions fetched. (OPTIONAL)
+        :return: {Stack name, Fingerprint} (Stacks not exists are not included)
+        """
+        snapshot = self.snapshot()
+        if snapshot is None or env.get('RefreshSnapshot'):
+            return {}
+        fingerprints = snapshot.fingerprints()
+        missing = [stack_name for stack_name in stack_names if stack_name not in fingerprints]
+
+        def describe(stack_name):
+            try:
+                return self.cfn_client().describe_stacks(StackName = stack_name)['Stacks'][0]
+            except botocore.exceptions.ClientError:
+                # Stack does not exists
+                return None
+
+        for stack_name, stack in zip(missing, self.map_concurrently(describe, missing)):
+            if stack is not None:
+                fingerprints[stack_name] = stack_fingerprint(stack)
+                if described is not None:
+                    described[stack_name] = stack
+        return fingerprints
 
     def list_stacks(self):
         """
         List stacks.
         """
-        paginator = self.cfn_client().get_paginator('list_stacks')
+        index = self.stack_name_index()
 
-        print('Fetching stacks...')
-        pages = []
-        next_token = None
-        while True:
-            page_iter = paginator.paginate(
-                StackStatusFilter = [
-                    'CREATE_IN_PROGRESS', 'CREATE_FAILED', 'CREATE_COMPLETE',
-                    'ROLLBACK_IN_PROGRESS', 'ROLLBACK_FAILED', 'ROLLBACK_COMPLETE',
-                    'DELETE_IN_PROGRESS', 'DELETE_FAILED', # 'DELETE_COMPLETE',
-                    'UPDATE_IN_PROGRESS', 'UPDATE_COMPLETE_CLEANUP_IN_PROGRESS', 'UPDATE_COMPLETE',
-                    'UPDATE_ROLLBACK_IN_PROGRESS', 'UPDATE_ROLLBACK_FAILED', 'UPDATE_ROLLBACK_COMPLETE_CLEANUP_IN_PROGRESS', 'UPDATE_ROLLBACK_COMPLETE',
-                    'REVIEW_IN_PROGRESS'],
-                PaginationConfig = {
-                    'MaxItems': 500,
-                    'StartingToken': next_token
-                }
+        def fetch(write):
+            not_created_stacks = OrderedDict(
+                (stack_def.actual_stack_name(), stack_def.stack_alias) for stack_def in self.stack_defs.values()
             )
-            for page in page_iter:
-                pages.append(page)
-            next_token = pages[-1].get('NextToken', None)
-            if not next_token:
-                break
 
-        # TODO Refactoring.
-        defined_stack_names = Set()
-        defined_stack_aliases = {}
-        for stack_def in self.stack_defs.values():
-            defined_stack_names.add(stack_def.actual_stack_name())
-            defined_stack_aliases[stack_def.actual_stack_name()] = stack_def.stack_alias
-
-        def is_in_stack_group(stack_name):
-            for defined_stack_name in defined_stack_names:
-                # startswith(...-) for Chained stack.
-                if stack_name == defined_stack_name or stack_name.startswith(defined_stack_name + '-'):
-                    return True
-            return False
-
-        table = PrettyTable(['StackAlias', 'StackName', 'Status', 'CreatedTime', 'UpdatedTime', 'Description'])
-        table.align['StackAlias'] = 'l'
-        table.align['StackName'] = 'l'
-        table.align['Description'] = 'l'
-        table.padding_width = 1
-        # Append existing stacks.
-        for page in pages:
-            summaries = page['StackSummaries']
-            for summary in summaries:
+            # Write existing stacks.
+            for summary in self.iter_stack_summaries(index):
                 stack_name = summary['StackName']
-                if is_in_stack_group(stack_name):
-                    table.add_row([
-                        # TODO Show Alias at chaining stack.
-                        defined_stack_aliases.pop(stack_name) if defined_stack_aliases.has_key(stack_name) else '', # pop!
-                        self.shorten(stack_name, 70, 5),
-                        self.colord_status(summary['StackStatus']),
-                        self.format_datetime(summary['CreationTime']),
-                        self.format_datetime(summary['LastUpdatedTime']) if summary.has_key('LastUpdatedTime') else '-',
-                        self.shorten(summary.get('TemplateDescription', ''), 70, 0)
-                    ])
-        # Append stacks that have not been created yet.
-        for not_exist_stack_name, not_exist_stack_alias in defined_stack_aliases.items():
-            table.add_row([
-                not_exist_stack_alias,
-                not_exist_stack_name,
-                'Not created',
-                '-',
-                '-',
-                '-'
-            ])
+                # Alias of defined stack, or parent stack of chained stack.
+                stack_alias = index.lookup(stack_name)
+                not_created_stacks.pop(stack_name, None)
+                write('Stacks', [
+                    stack_alias,
+                    stack_name,
+                    summary['StackStatus'],
+                    summary['CreationTime'],
+                    summary.get('LastUpdatedTime'),
+                    summary.get('TemplateDescription', '')
+                ])
+            # Write stacks that have not been created yet.
+            for not_exist_stack_name, not_exist_stack_alias in not_created_stacks.items():
+                write('Stacks', [
+                    not_exist_stack_alias,
+                    not_exist_stack_name,
+                    'Not created',
+                    None,
+                    None,
+                    None
+                ])
 
-        print(blue('Stacks:', bold = True))
-        print(table)
+        self.notice('Fetching stacks...')
+        self.__query_targets([
+            Table(
+                'Stacks',
+                'Stacks:',
+                ['StackAlias', 'StackName', 'Status', 'CreatedTime', 'UpdatedTime', 'Description'],
+                ['StackAlias', 'StackName', 'Description'],
+                {
+                    'StackName': lambda name: self.shorten(name, 70, 5),
+                    'Status': self.colord_status,
+                    'CreatedTime': self.format_datetime,
+                    'UpdatedTime': self.format_datetime,
+                    'Description': lambda description: self.shorten(description, 70, 0) if description is not None else '-'
+                }
+            )
+        ], fetch)
 
-    def desc_stack(self, alias_or_stackname):
+    def desc_stack(self, alias_or_stackname, events = DESC_STACK_EVENTS):
         """
         Describe existing stack.
 
         :param alias_or_stackname: Stack alias or Stack name.
+        :param events: Number of latest events to show. (Default 20)
         """
         if self.stack_defs.has_key(alias_or_stackname):
             stack_name = self.stack_defs[alias_or_stackname].actual_stack_name()
         else:
             stack_name = alias_or_stackname
+        window = int(events)
 
-        stack = self.cfn_resource().Stack(stack_name)
-        try:
-            stack.stack_id
-        except botocore.exceptions.ClientError:
-            # Stack does not exists
-            print(yellow('Stack %s does not exists.' % stack.name))
-            return
+        def fetch_details(described = None):
+            client = self.cfn_client()
 
-        print(blue('Stack:', bold = True))
-        table = PrettyTable()
-        table.add_column('StackName', [stack.stack_name])
-        table.align['StackName'] = 'l'
-        table.add_column('Status', [self.colord_status(stack.stack_status)])
-        table.add_column('CreatedTime', [self.format_datetime(stack.creation_time)])
-        table.add_column('UpdatedTime', [self.format_datetime(stack.last_updated_time)])
-        table.add_column('Description', [self.shorten(stack.description, 70, 0)])
-        print(table)
+            def describe_stack():
+                return described or client.describe_stacks(StackName = stack_name)['Stacks'][0]
 
-        print(blue('Parameters:', bold = True))
-        if stack.parameters is None:
-            print('No parameters.')
-        else:
-            table = PrettyTable(['Key', 'Value'])
-            table.align['Key'] = 'l'
-            table.align['Value'] = 'l'
-            for param in stack.parameters:
-                table.add_row([
-                    param['ParameterKey'],
-                    param['ParameterValue']
-                ])
-            print(table)
+            def describe_events():
+                return client.describe_stack_events(StackName = stack_name)
 
-        print(blue('Outputs:', bold = True))
-        if stack.outputs is None:
-            print('No outputs.')
-        else:
-            table = PrettyTable(['Key', 'Value', 'Description'])
-            table.align['Key'] = 'l'
-            table.align['Value'] = 'l'
-            table.align['Description'] = 'l'
-            for output in stack.outputs:
-                table.add_row([
-                    output['OutputKey'],
-                    output['OutputValue'],
-                    self.shorten(output['Description'], 70, 0) if output.has_key('Description') else '-'
+            # Fetch description and first page of events at the same time.
+            try:
+                stack, page = self.map_concurrently(lambda fetch: fetch(), [describe_stack, describe_events])
+            except botocore.exceptions.ClientError:
+                # Stack does not exists
+                return None
+
+            # Events are returned newest first. Stop paging as soon as the window is filled.
+            events = page['StackEvents'][:window]
+            while len(events) < window and page.get('NextToken'):
+                page = client.describe_stack_events(StackName = stack_name, NextToken = page['NextToken'])
+                events.extend(page['StackEvents'][:window - len(events)])
+            return {'stack': stack, 'events': events}
+
+        def fetch(write):
+            snapshot = self.snapshot()
+            described = {}
+            fingerprint = self.__stack_fingerprints([stack_name], described).get(stack_name)
+            details = snapshot.get(stack_name, 'details:%d' % window, fingerprint) if fingerprint is not None else None
+            if details is None:
+                details = fetch_details(described.get(stack_name))
+                if details is None:
+                    self.notice(yellow('Stack %s does not exists.' % stack_name))
+                    return
+                if snapshot is not None:
+                    # Fetched stack identifies its own state.
+                    snapshot.put(stack_name, 'details:%d' % window, stack_fingerprint(details['stack']), details)
+                    snapshot.save()
+
+            stack = details['stack']
+            write('Stack', [
+                stack['StackName'],
+                stack['StackStatus'],
+                stack['CreationTime'],
+                stack.get('LastUpdatedTime'),
+                stack.get('Description', '')
+            ])
+            for param in stack.get('Parameters', []):
+                write('Parameters', [param['ParameterKey'], param['ParameterValue']])
+            for output in stack.get('Outputs', []):
+                write('Outputs', [output['OutputKey'], output['OutputValue'], output.get('Description')])
+            for event in details['events']:
+                write('Events', [
+                    event['Timestamp'],
+                    event['ResourceStatus'],
+                    event['ResourceType'],
+                    event['LogicalResourceId'],
+                    event.get('ResourceStatusReason')
                 ])
-            print(table)
 
-        print(blue('Events(last 20):', bold = True))
-        table = PrettyTable(['Timestamp', 'Status', 'Type', 'LogicalID', 'StatusReason'])
-        table.align['Timestamp'] = 'l'
-        table.align['Type'] = 'l'
-        table.align['LogicalID'] = 'l'
-        table.align['StatusReason'] = 'l'
-        # Show latest 20 events.
-        for event in list(stack.events.all())[:20]:
-            table.add_row([
-                self.format_datetime(event.timestamp),
-                self.colord_status(event.resource_status),
-                event.resource_type,
-                event.logical_resource_id,
-                self.shorten(event.resource_status_reason, 70, 0) if event.resource_status_reason is not None else ''
-            ])
+        self.__query_targets([
+            Table(
+                'Stack',
+                'Stack:',
+                ['StackName', 'Status', 'CreatedTime', 'UpdatedTime', 'Description'],
+                ['StackName'],
+                {
+                    'Status': self.colord_status,
+                    'CreatedTime': self.format_datetime,
+                    'UpdatedTime': self.format_datetime,
+                    'Description': lambda description: self.shorten(description, 70, 0)
+                },
+                required = True
+            ),
+            Table(
+                'Parameters',
+                'Parameters:',
+                ['Key', 'Value'],
+                ['Key', 'Value'],
+                empty_message = 'No parameters.'
+            ),
+            Table(
+                'Outputs',
+                'Outputs:',
+                ['Key', 'Value', 'Description'],
+                ['Key', 'Value', 'Description'],
+                {'Description': lambda description: self.shorten(description, 70, 0) if description is not None else '-'},
+                empty_message = 'No outputs.'
+            ),
+            Table(
+                'Events',
+                'Events(last %d):' % window,
+                ['Timestamp', 'Status', 'Type', 'LogicalID', 'StatusReason'],
+                ['Timestamp', 'Type', 'LogicalID', 'StatusReason'],
+                {
+                    'Timestamp': self.format_datetime,
+                    'Status': self.colord_status,
+                    'StatusReason': lambda reason: self.shorten(reason, 70, 0) if reason is not None else ''
+                }
+            )
+        ], fetch)
+
+    def print_table(self, title, columns, rows, align_left = ()):
+        table = prettytable.PrettyTable(columns)
+        for column in align_left:
+            table.align[column] = 'l'
+        for row in rows:
+            table.add_row(row)
+        print(blue(title, bold = True))
         print(table)
 
-    # TODO Bulk create all stacks.
-    # TODO Bulk update all stacks.
-    # TODO Bulk delete all stacks.
+    def output(self, output_format):
+        """
+        Write rows of list_stacks, list_resources, list_exports and desc_stack as soon as fetched,
+        in machine readable format. Values are not colored nor shortened.
 
-    def list_resources(self):
+        :param output_format: json, jsonl or csv.
         """
-        List existing stack resources.
+        if output_format not in OUTPUT_FORMATS:
+            abort(red('Unknown output format %s. (%s)' % (output_format, ', '.join(OUTPUT_FORMATS))))
+        env.OutputFormat = output_format
+        # Keep stdout parseable. (Do not print "Done.")
+        output['status'] = False
+
+        return self
+
+    def notice(self, message):
         """
-        paginator = self.cfn_client().get_paginator('list_stack_resources')
+        Print message. Printed to stderr in machine readable output format not to break output.
 
-        table = PrettyTable(['StackName', 'LogicalID', 'PhysicalID', 'Type', 'Status', 'UpdatedTime'])
-        table.align['StackName'] = 'l'
-        table.align['LogicalID'] = 'l'
-        table.align['PhysicalID'] = 'l'
-        table.align['Type'] = 'l'
+        :param message: Message.
+        """
+        print(message, file = sys.stderr if self.streaming() else sys.stdout)
+
+    def streaming(self):
+        return bool(env.get('OutputFormat'))
+
+    def open_writer(self, tables):
+        """
+        Open writer of rows.
+
+        :param tables: Tables.
+        :return: RecordWriter if output format is set, otherwise TableWriter.
+        """
+        if self.streaming():
+            return RecordWriter(env.OutputFormat, tables)
+        return TableWriter(tables, self.print_table)
+
+    def targets(self, *targets):
+        """
+        Set AWS targets queried concurrently by list_stacks, list_resources, list_exports and desc_stack.
+
+        :param targets: Targets like REGION or PROFILE@REGION.
+        """
+        env.Targets = []
+        for target in targets:
+            profile, _, region = target.rpartition('@')
+            aws_target = self.aws_target()
+            aws_target.update(region = region)
+            if profile:
+                aws_target.update(profile = profile, access_key_id = None, secret_access_key = None)
+            env.Targets.append(aws_target)
+        self.notice(green('Use AWS targets %s.' % ', '.join(targets), bold = True))
+
+        return self
+
+    def __query_targets(self, tables, fetch):
+        """
+        Fetch rows of tables on current AWS target,
+        or on each target set by targets task concurrently.(Prepend Region and Account columns)
+        Rows are streamed in machine readable output format, otherwise printed as tables at last.
 
-        print('Fetching resources...')
+        :param tables: Tables.
+        :param fetch: Function takes write function. (Call write(table name, row) for each row)
+        """
+        targets = env.get('Targets')
+        if targets:
+            for table in tables:
+                table.columns = ['Region', 'Account'] + table.columns
+        writer = self.open_writer(tables)
+        if not targets:
+            fetch(writer.write)
+            writer.close()
+            return
+
+        def fetch_target(target):
+            self.__local.target = target
+            try:
+                account = self.client_pool.client('sts', **target).get_caller_identity()['Account']
+                prefix = [target['region'], account]
+                # Tables are grouped by target, streams are written as soon as fetched.
+                rows = []
+                if self.streaming():
+                    fetch(lambda name, row: writer.write(name, prefix + row))
+                else:
+                    fetch(lambda name, row: rows.append((name, prefix + row)))
+                return rows
+            except (botocore.exceptions.ClientError, botocore.exceptions.BotoCoreError) as e:
+                self.notice(red('Failed to query %s(%s). %s' % (target['region'], target['profile'] or 'default', e)))
+                return None
+            finally:
+                self.__local.target = None
+
+        results = self.map_concurrently(fetch_target, targets)
+        for rows in results:
+            for name, row in rows or []:
+                writer.write(name, row)
+        writer.close()
+        if all(rows is None for rows in results):
+            abort(red('Failed to query all targets.'))
+
+    def map_concurrently(self, func, items):
+        """
+        Apply function to items concurrently.
+
+        :param func: Function takes an item.
+        :param items: Items.
+        :return: Results in order of items.
+        """
+        # Workers query same AWS target as caller.
+        target = getattr(self.__local, 'target', None)
+
+        def run(item):
+            self.__local.target = target
+            try:
+                return func(item)
+            finally:
+                self.__local.target = None
+
+        with ThreadPoolExecutor(max_workers = self.actual_max_workers()) as executor:
+            return list(executor.map(run, items))
+
+    def stack_dependencies(self):
+        """
+        Resolve dependencies between defined stacks.
+        Dependencies are specified by define_stack(depends_on = ...) and Export/Fn::ImportValue in local templates.
+
+        :return: {Stack alias, Set of stack aliases depends on}
+        """
+        exporters = {}
+        imports = {}
         for stack_def in self.stack_defs.values():
-            stack_name = stack_def.actual_stack_name()
             try:
-                pages = []
-                next_token = None
-                while True:
-                    page_iter = paginator.paginate(
-                        StackName = stack_name,
-                        PaginationConfig = {
-                            'MaxItems': 500,
-                            'StartingToken': next_token
-                        }
-                    )
-                    for page in page_iter:
-                        pages.append(page)
-                    next_token = pages[-1].get('NextToken', None)
-                    if not next_token:
-                        break
-
-                for page in pages:
-                    summaries = page['StackResourceSummaries']
-                    for summary in summaries:
-                        table.add_row([
-                            stack_name,
-                            summary['LogicalResourceId'],
-                            self.shorten(summary['PhysicalResourceId'], 40, 5),
-                            summary['ResourceType'],
-                            self.colord_status(summary['ResourceStatus']),
-                            self.format_datetime(summary['LastUpdatedTimestamp'])
-                        ])
-            except botocore.exceptions.ClientError:
-                # Ignore this stack if exception occurred.
-              pass
+                template = stack_def.load_template()
+            except IOError:
+                print(yellow('Template %s not found. Ignore Export/Fn::ImportValue of stack %s.' % (
+                    stack_def.template_local_path(), stack_def.stack_alias
+                )))
+                continue
+            variables = dict(env)
+            variables['AWS::StackName'] = stack_def.actual_stack_name()
+            if env.get('Region'):
+                variables['AWS::Region'] = env.Region
+            for name in exported_names(template, variables):
+                exporters[name] = stack_def.stack_alias
+            imports[stack_def.stack_alias] = imported_names(template, variables)
+
+        dependencies = OrderedDict()
+        for alias, stack_def in self.stack_defs.items():
+            depends = set(stack_def.depends_on)
+            for name in imports.get(alias, []):
+                if exporters.has_key(name) and exporters[name] != alias:
+                    depends.add(exporters[name])
+            undefined = depends.difference(self.stack_defs.keys())
+            if undefined:
+                abort(red('Stack %s depends on undefined stack(s) %s.' % (alias, ', '.join(sorted(undefined)))))
+            dependencies[alias] = depends
+        return dependencies
+
+    def __sort_stacks(self, dependencies):
+        # Topological sort. Keep defined order as much as possible.
+        remaining = OrderedDict((alias, set(depends)) for alias, depends in dependencies.items())
+        ordered = []
+        while remaining:
+            ready = [alias for alias, depends in remaining.items() if not depends]
+            if not ready:
+                abort(red('Circular dependency between stacks %s.' % ', '.join(remaining.keys())))
+            for alias in ready:
+                del remaining[alias]
+                for depends in remaining.values():
+                    depends.discard(alias)
+            ordered.extend(ready)
+        return ordered
+
+    def __execute_stacks(self, title, operation, aliases, reverse = False):
+        """
+        Execute operation on stacks concurrently in dependency order.
+        A stack is started as soon as all stacks it depends on are finished.
+
+        :param title: Operation title.
+        :param operation: Function takes StackDef.
+        :param aliases: Target stack aliases.
+        :param reverse: Execute in reverse dependency order. (For delete)
+        """
+        dependencies = self.stack_dependencies()
+        if reverse:
+            dependencies = OrderedDict(
+                (alias, set(dependent for dependent, depends in dependencies.items() if alias in depends))
+                for alias in dependencies.keys()
+            )
+        # Only wait for target stacks. Others are already created(or deleted).
+        pending = OrderedDict(
+            (alias, dependencies[alias].intersection(aliases))
+            for alias in self.__sort_stacks(dependencies) if alias in aliases
+        )
 
-        print(blue('Resrouces:', bold = True))
+        print('%s %d stack(s) with %d worker(s)...' % (title, len(pending), self.actual_max_workers()))
+        results = OrderedDict((alias, None) for alias in pending.keys())
+        started = {}
+        failed = False
+        in_progress = []
+        env.BulkExecution = True
+        self.interrupted.clear()
+        executor = ThreadPoolExecutor(max_workers = self.actual_max_workers())
+        running = {}
+        try:
+            while pending or running:
+                for alias in [alias for alias, depends in pending.items() if not depends]:
+                    del pending[alias]
+                    started[alias] = time.time()
+                    running[executor.submit(operation, self.stack_defs[alias])] = alias
+
+                # Wait with timeout, so Ctrl+C is handled by main thread.
+                done, _ = wait(running.keys(), timeout = 1, return_when = FIRST_COMPLETED)
+                for future in done:
+                    alias = running.pop(future)
+                    elapsed = '%.1fs' % (time.time() - started[alias])
+                    try:
+                        future.result()
+                    except (Exception, SystemExit) as e:
+                        failed = True
+                        results[alias] = (red('Failed: %s' % e), elapsed)
+                        # Skip stacks depend on failed stack.
+                        blocked = [alias]
+                        while blocked:
+                            blocked_alias = blocked.pop()
+                            for dependent in [a for a, depends in pending.items() if blocked_alias in depends]:
+                                del pending[dependent]
+                                results[dependent] = (yellow('Skipped (depends on %s)' % blocked_alias), '-')
+                                blocked.append(dependent)
+                    else:
+                        results[alias] = (green('Succeeded'), elapsed)
+                        for depends in pending.values():
+                            depends.discard(alias)
+        except KeyboardInterrupt:
+            # Stop starting stacks, and stop waiting for stacks started. (CloudFormation continues them)
+            self.interrupted.set()
+            for future, alias in running.items():
+                elapsed = '%.1fs' % (time.time() - started[alias])
+                if future.cancel():
+                    results[alias] = (yellow('Canceled'), '-')
+                elif future.done():
+                    error = future.exception()
+                    failed = failed or error is not None
+                    results[alias] = (red('Failed: %s' % error) if error is not None else green('Succeeded'), elapsed)
+                else:
+                    in_progress.append(alias)
+                    results[alias] = (red('Interrupted'), elapsed)
+            for alias in pending.keys():
+                results[alias] = (yellow('Skipped (interrupted)'), '-')
+        finally:
+            env.BulkExecution = False
+            executor.shutdown(wait = not self.interrupted.is_set())
+
+        table = prettytable.PrettyTable(['StackAlias', 'StackName', 'Result', 'Elapsed'])
+        table.align['StackAlias'] = 'l'
+        table.align['StackName'] = 'l'
+        table.align['Result'] = 'l'
+        for alias, (result, elapsed) in results.items():
+            table.add_row([alias, self.stack_defs[alias].actual_stack_name(), result, elapsed])
+        print(blue('Results:', bold = True))
         print(table)
 
-    def list_exports(self):
+        if self.interrupted.is_set():
+            abort(red('%s stacks interrupted. Still in progress on CloudFormation: %s' % (title, ', '.join(in_progress) or '-')))
+        if failed:
+            abort(red('%s stacks failed.' % title))
+
+    def __describe_stack_defs(self):
+        print('Fetching stacks...')
+        stack_defs = self.stack_defs.values()
+        return zip(stack_defs, self.map_concurrently(lambda stack_def: stack_def.describe(), stack_defs))
+
+    def create_all(self, **kwparams):
         """
-        List exports.
+        Create all stacks not created yet. Independent stacks are created concurrently.
+
+        :param kwparams: Stack parameters.
         """
-        def get_exported_stack_name(export):
-            exportingStackId = export['ExportingStackId']
-            for stack_def in self.stack_defs.values():
-                stack_name = stack_def.actual_stack_name()
-                if stack_name in exportingStackId:  # Contains stack name in exporting stack name.
-                    return stack_name
-            return None
+        self.params(**kwparams)
+
+        targets = []
+        for stack_def, stack in self.__describe_stack_defs():
+            # Stack in review is created by DRY-RUN.
+            if stack is None or stack['StackStatus'] == 'REVIEW_IN_PROGRESS':
+                targets.append(stack_def)
+            else:
+                print(yellow('Stack %s already exists. Skip it.' % stack_def.actual_stack_name()))
 
-        def recursive_list_exports():
-            def _recursive(a, res = []):
-                res = res + a.get("Exports", [])
-                nt = a.get("NextToken", None)
-                exists_next = nt is not None and len(nt) > 0
-                if exists_next:
-                    b = self.cfn_client().list_exports(NextToken = nt)
-                    return _recursive(b, res)
+        # Resolve all parameters before creating stacks.
+        templates = self.map_concurrently(lambda stack_def: stack_def.template_summary(), targets)
+        stack_params = dict(zip(
+            [stack_def.stack_alias for stack_def in targets],
+            self.resolve_all_params([(stack_def, template, None) for stack_def, template in zip(targets, templates)])
+        ))
+
+        self.__execute_stacks(
+            'Creating',
+            lambda stack_def: stack_def.execute_create(stack_params[stack_def.stack_alias]),
+            stack_params.keys()
+        )
+
+    @confirm
+    def update_all(self, **kwparams):
+        """
+        Update all existing stacks. Independent stacks are updated concurrently.
+
+        :param kwparams: Stack parameters.
+        """
+        self.params(**kwparams)
+
+        targets = []
+        for stack_def, stack in self.__describe_stack_defs():
+            if stack is None or stack['StackStatus'] == 'REVIEW_IN_PROGRESS':
+                print(yellow('Stack %s does not exists. Skip it.' % stack_def.actual_stack_name()))
+            else:
+                targets.append((stack_def, stack))
+
+        # Skip stacks deployed with same template, parameters and stack arguments.
+        fingerprints = self.deployed_fingerprints(stack['StackName'] for _, stack in targets)
+        skipped = self.unchanged_stacks(targets, fingerprints)
+        for stack_def, _ in targets:
+            if stack_def.stack_alias in skipped:
+                print(yellow('Stack %s is not changed. Skip it.' % stack_def.actual_stack_name()))
+        targets = [(stack_def, stack) for stack_def, stack in targets if stack_def.stack_alias not in skipped]
+
+        # Resolve all parameters before updating stacks.
+        templates = self.map_concurrently(lambda target: target[0].template_summary(), targets)
+        stack_params = dict(zip(
+            [stack_def.stack_alias for stack_def, _ in targets],
+            self.resolve_all_params([
+                (stack_def, template, stack.get('Parameters', [])) for (stack_def, stack), template in zip(targets, templates)
+            ])
+        ))
+
+        # Parameters prompted may be same as deployed too.
+        unchanged = self.map_concurrently(
+            lambda target: target[0].unchanged(target[1], stack_params[target[0].stack_alias], fingerprints), targets
+        )
+        for (stack_def, _), skip in zip(targets, unchanged):
+            if skip:
+                print(yellow('Stack %s is not changed. Skip it.' % stack_def.actual_stack_name()))
+                del stack_params[stack_def.stack_alias]
+
+        self.__execute_stacks(
+            'Updating',
+            lambda stack_def: stack_def.execute_update(stack_params[stack_def.stack_alias]),
+            stack_params.keys()
+        )
+
+    @confirm
+    def delete_all(self):
+        """
+        Delete all existing stacks. Stacks are deleted in reverse dependency order.
+        """
+        targets = []
+        for stack_def, stack in self.__describe_stack_defs():
+            if stack is None:
+                print(yellow('Stack %s does not exists. Skip it.' % stack_def.actual_stack_name()))
+            else:
+                targets.append(stack_def.stack_alias)
+
+        self.__execute_stacks(
+            'Deleting',
+            lambda stack_def: stack_def.execute_delete(),
+            targets,
+            reverse = True
+        )
+
+    def dryrun_all(self, show_details = False, **kwparams):
+        """
+        Compute changes of all stacks concurrently, and show summary of them. (DRY-RUN)
+
+        :param show_details: True to show changes of all stacks, or Stack alias to show changes of the stack. (Default False)
+        :param kwparams: Stack parameters.
+        """
+        self.params(**kwparams)
+        print(yellow('===== DRY-RUN mode ====='))
+
+        # Stacks deployed with same template, parameters and stack arguments have no changes.
+        targets = list(self.__describe_stack_defs())
+        existing = [
+            (stack_def, stack) for stack_def, stack in targets
+            if stack is not None and stack['StackStatus'] != 'REVIEW_IN_PROGRESS'
+        ]
+        fingerprints = self.deployed_fingerprints(stack['StackName'] for _, stack in existing)
+        skipped = self.unchanged_stacks(existing, fingerprints)
+        checking = [(stack_def, stack) for stack_def, stack in targets if stack_def.stack_alias not in skipped]
+
+        # Resolve all parameters before creating ChangeSets.
+        templates = self.map_concurrently(lambda target: target[0].template_summary(), checking)
+        resolving = []
+        for (stack_def, stack), template in zip(checking, templates):
+            if stack is None or stack['StackStatus'] == 'REVIEW_IN_PROGRESS':
+                resolving.append((stack_def, template, None))
+            else:
+                resolving.append((stack_def, template, stack.get('Parameters', [])))
+        requests = [
+            (stack_def, 'CREATE' if previous_params is None else 'UPDATE', stack_params)
+            for (stack_def, _, previous_params), stack_params in zip(resolving, self.resolve_all_params(resolving))
+        ]
+
+        # Submit all ChangeSets at once. (Rate limited by rate_limiter)
+        def submit(request):
+            stack_def, change_set_type, stack_params = request
+            try:
+                return stack_def.create_change_set(change_set_type, stack_params)
+            except botocore.exceptions.ClientError as e:
+                return e
+
+        # Parameters prompted may be same as deployed too.
+        stacks = dict((stack_def.stack_alias, stack) for stack_def, stack in targets)
+        unchanged = self.map_concurrently(
+            lambda request: request[1] == 'UPDATE' and request[0].unchanged(
+                stacks[request[0].stack_alias], request[2], fingerprints
+            ),
+            requests
+        )
+        skipped.update(request[0].stack_alias for request, skip in zip(requests, unchanged) if skip)
+        change_set_types = dict((stack_def.stack_alias, change_set_type) for stack_def, change_set_type, _ in requests)
+        results = OrderedDict()
+        for stack_def, _ in targets:
+            results[stack_def.stack_alias] = (change_set_types.get(stack_def.stack_alias, 'UPDATE'), {
+                'Status': 'FAILED',
+                'StatusReason': 'No updates are to be performed. (Same fingerprint as deployed)'
+            } if stack_def.stack_alias in skipped else None)
+        requests = [request for request in requests if request[0].stack_alias not in skipped]
+
+        print('Creating %d ChangeSet(s)...' % len(requests))
+        pending = OrderedDict()
+        for (stack_def, change_set_type, _), submitted in zip(requests, self.map_concurrently(submit, requests)):
+            if isinstance(submitted, Exception):
+                results[stack_def.stack_alias] = (change_set_type, submitted)
+            else:
+                results[stack_def.stack_alias] = (change_set_type, None)
+                pending[stack_def.stack_alias] = submitted
+
+        # Wait all ChangeSets together.
+        print('Computing changes...')
+        for alias, change_set in self.__wait_change_sets(pending).items():
+            results[alias] = (results[alias][0], change_set)
+
+        # Count changes of all pages.
+        completed = [
+            (alias, change_set) for alias, (_, change_set) in results.items()
+            if isinstance(change_set, dict) and change_set['Status'] == 'CREATE_COMPLETE'
+        ]
+        change_counts = dict(zip(
+            [alias for alias, _ in completed],
+            self.map_concurrently(lambda item: self.stack_defs[item[0]].count_changes(item[1]), completed)
+        ))
+
+        table = prettytable.PrettyTable(['StackAlias', 'StackName', 'Type', 'Status', 'Add', 'Modify', 'Remove', 'Replacement'])
+        table.align['StackAlias'] = 'l'
+        table.align['StackName'] = 'l'
+        table.align['Status'] = 'l'
+        for alias, (change_set_type, change_set) in results.items():
+            row = [alias, self.stack_defs[alias].actual_stack_name(), change_set_type]
+            if isinstance(change_set, Exception):
+                table.add_row(row + [red(self.shorten(change_set.response['Error']['Message'], 70, 0)), '-', '-', '-', '-'])
+            elif change_set['Status'] != 'CREATE_COMPLETE':
+                reason = change_set.get('StatusReason', change_set['Status'])
+                if 'didn\'t contain changes' in reason or 'No updates are to be performed' in reason:
+                    table.add_row(row + [yellow('No changes'), 0, 0, 0, 0])
                 else:
-                    return res
-            return _recursive(self.cfn_client().list_exports())
-
-        print('Fetching exports...')
-        exports = recursive_list_exports()
-
-        table = PrettyTable(['ExportedStackName', 'ExportName', 'ExportValue'])
-        table.align['ExportedStackName'] = 'l'
-        table.align['ExportName'] = 'l'
-        table.align['ExportValue'] = 'l'
-        for export in exports:
-            exported_stack_name = get_exported_stack_name(export)
-            if exported_stack_name is not None:
-                table.add_row([
-                    exported_stack_name,
-                    export['Name'],
-                    export['Value']
+                    table.add_row(row + [red(self.shorten(reason, 70, 0)), '-', '-', '-', '-'])
+            else:
+                counts = change_counts[alias]
+                table.add_row(row + [
+                    green('Changes'),
+                    counts['Add'],
+                    counts['Modify'],
+                    counts['Remove'],
+                    counts['Replacement']
                 ])
-        print(blue('Exports:', bold = True))
+        print(blue('Changes:', bold = True))
         print(table)
 
-    def dryrun(self, show_details = False):
+        # Show changes of requested stacks.
+        env.DryRunShowDetails = False
+        for alias, (_, change_set) in results.items():
+            if show_details in (True, 'True', alias) and isinstance(change_set, dict) and change_set['Status'] == 'CREATE_COMPLETE':
+                print(blue('===== %s =====' % alias, bold = True))
+                self.stack_defs[alias].show_change_set(change_set)
+
+    def __wait_change_sets(self, pending):
+        """
+        Wait ChangeSets together until all of them are completed(or failed).
+
+        :param pending: {Stack alias, ChangeSet name}
+        :return: {Stack alias, ChangeSet}
+        """
+        return self.__poll_together(
+            pending,
+            lambda alias, change_set_name: self.cfn_client().describe_change_set(
+                StackName = self.stack_defs[alias].actual_stack_name(),
+                ChangeSetName = change_set_name
+            ),
+            lambda change_set: change_set['Status'] in ('CREATE_COMPLETE', 'FAILED', 'DELETE_COMPLETE')
+        )
+
+    def __poll_together(self, pending, describe, is_completed, timeout = TIMEOUT):
+        """
+        Poll statuses of stacks concurrently with backoff, until all of them are completed.
+        Abort if some of them are not completed in timeout. (Same limits as StackEventWaiter)
+
+        :param pending: {Stack alias, ID to poll}
+        :param describe: Function takes stack alias and ID, returns status.
+        :param is_completed: Function takes status, returns True if completed.
+        :param timeout: Seconds to give up waiting.
+        :return: {Stack alias, Status}
+        """
+        pending = OrderedDict(pending)
+        completed = OrderedDict()
+        started = time.time()
+        delay = MIN_DELAY
+
+        while pending:
+            statuses = self.map_concurrently(lambda item: describe(*item), pending.items())
+            for alias, status in zip(list(pending.keys()), statuses):
+                if is_completed(status):
+                    completed[alias] = status
+                    del pending[alias]
+            if pending:
+                if time.time() - started > timeout:
+                    abort(red('Timed out waiting for %d stack(s). (%s)' % (len(pending), ', '.join(pending.keys()))))
+                time.sleep(delay)
+                delay = min(delay * 1.5, MAX_DELAY)
+        return completed
+
+    def detect_drift(self, show_diff = False):
+        """
+        Detect drift of all stacks concurrently, and show combined report.
+
+        :param show_diff: Set True to show expected and actual values of drifted properties. (Default False)
+        """
+        show_diff = show_diff in (True, 'True')
+        stack_defs = self.stack_defs.values()
+
+        def detect(stack_def):
+            try:
+                return self.cfn_client().detect_stack_drift(
+                    StackName = stack_def.actual_stack_name()
+                )['StackDriftDetectionId']
+            except botocore.exceptions.ClientError as e:
+                return e
+
+        # Start detection of all stacks at once.
+        print('Detecting drift of %d stack(s)...' % len(stack_defs))
+        results = OrderedDict()
+        pending = OrderedDict()
+        for stack_def, detected in zip(stack_defs, self.map_concurrently(detect, stack_defs)):
+            results[stack_def.stack_alias] = detected if isinstance(detected, Exception) else None
+            if not isinstance(detected, Exception):
+                pending[stack_def.stack_alias] = detected
+
+        # Wait all detections together.
+        results.update(self.__poll_together(
+            pending,
+            lambda alias, detection_id: self.cfn_client().describe_stack_drift_detection_status(
+                StackDriftDetectionId = detection_id
+            ),
+            lambda status: status['DetectionStatus'] != 'DETECTION_IN_PROGRESS'
+        ))
+
+        # Fetch drifted resources of drifted stacks.
+        def describe_drifts(alias):
+            drifts = []
+            args = dict(
+                StackName = self.stack_defs[alias].actual_stack_name(),
+                StackResourceDriftStatusFilters = ['MODIFIED', 'DELETED'],
+                MaxResults = 100
+            )
+            while True:
+                page = self.cfn_client().describe_stack_resource_drifts(**args)
+                drifts.extend(page['StackResourceDrifts'])
+                if not page.get('NextToken'):
+                    return drifts
+                args['NextToken'] = page['NextToken']
+
+        drifted = [
+            alias for alias, status in results.items()
+            if isinstance(status, dict) and status.get('StackDriftStatus') == 'DRIFTED'
+        ]
+        resource_drifts = OrderedDict(zip(drifted, self.map_concurrently(describe_drifts, drifted)))
+
+        rows = []
+        for alias, status in results.items():
+            row = [alias, self.stack_defs[alias].actual_stack_name()]
+            if isinstance(status, Exception):
+                message = status.response['Error']['Message']
+                if 'does not exist' in message:
+                    rows.append(row + ['Not created', '-', '-'])
+                else:
+                    rows.append(row + [red('FAILED'), '-', self.shorten(message, 70, 0)])
+                continue
+            drift_status = status.get('StackDriftStatus', status['DetectionStatus'])
+            rows.append(row + [
+                red(drift_status) if drift_status == 'DRIFTED' else green(drift_status)
+                if drift_status == 'IN_SYNC' else yellow(drift_status),
+                status.get('DriftedStackResourceCount', '-'),
+                self.shorten(status.get('DetectionStatusReason', ''), 70, 0)
+            ])
+        self.print_table(
+            'Drift:',
+            ['StackAlias', 'StackName', 'DriftStatus', 'Drifted', 'Reason'],
+            rows,
+            ['StackAlias', 'StackName', 'Reason']
+        )
+
+        if not resource_drifts:
+            return
+        self.print_table(
+            'Drifted resources:',
+            ['StackName', 'LogicalID', 'PhysicalID', 'Type', 'DriftStatus', 'Properties'],
+            [
+                [
+                    self.stack_defs[alias].actual_stack_name(),
+                    drift['LogicalResourceId'],
+                    self.shorten(drift.get('PhysicalResourceId', '-'), 40, 5),
+                    drift['ResourceType'],
+                    red(drift['StackResourceDriftStatus']),
+                    len(drift.get('PropertyDifferences', []))
+                ]
+                for alias, drifts in resource_drifts.items() for drift in drifts
+            ],
+            ['StackName', 'LogicalID', 'PhysicalID', 'Type']
+        )
+
+        if show_diff:
+            self.print_table(
+                'Differences:',
+                ['StackName', 'LogicalID', 'PropertyPath', 'DifferenceType', 'Expected', 'Actual'],
+                [
+                    [
+                        self.stack_defs[alias].actual_stack_name(),
+                        drift['LogicalResourceId'],
+                        difference['PropertyPath'],
+                        difference['DifferenceType'],
+                        green(self.shorten(difference.get('ExpectedValue', '-'), 40, 0)),
+                        red(self.shorten(difference.get('ActualValue', '-'), 40, 0))
+                    ]
+                    for alias, drifts in resource_drifts.items()
+                    for drift in drifts
+                    for difference in drift.get('PropertyDifferences', [])
+                ],
+                ['StackName', 'LogicalID', 'PropertyPath', 'Expected', 'Actual']
+            )
+
+    def list_resources(self):
+        """
+        List existing stack resources.
+        """
+        def fetch_resources(stack_def, snapshot, fingerprint, write):
+            stack_name = stack_def.actual_stack_name()
+            summaries = snapshot.get(stack_name, 'resources', fingerprint) if fingerprint is not None else None
+            if summaries is not None:
+                for summary in summaries:
+                    write_resource(write, stack_name, summary)
+                return
+
+            summaries = []
+            try:
+                # Write each page as soon as fetched.
+                for page in self.cfn_client().get_paginator('list_stack_resources').paginate(StackName = stack_name):
+                    for summary in page['StackResourceSummaries']:
+                        write_resource(write, stack_name, summary)
+                    if fingerprint is not None:
+                        summaries.extend(page['StackResourceSummaries'])
+            except botocore.exceptions.ClientError as e:
+                if 'does not exist' in e.response['Error']['Message']:
+                    write('Errors', [stack_name, STACK_NOT_EXISTS])
+                else:
+                    write('Errors', [stack_name, 'Failed to fetch resources. %s' % e])
+                return
+            if fingerprint is not None:
+                snapshot.put(stack_name, 'resources', fingerprint, summaries)
+
+        def write_resource(write, stack_name, summary):
+            write('Resources', [
+                stack_name,
+                summary['LogicalResourceId'],
+                summary.get('PhysicalResourceId'),
+                summary['ResourceType'],
+                summary['ResourceStatus'],
+                summary['LastUpdatedTimestamp']
+            ])
+
+        def fetch(write):
+            snapshot = self.snapshot()
+            fingerprints = self.__stack_fingerprints(
+                [stack_def.actual_stack_name() for stack_def in self.stack_defs.values()]
+            )
+
+            def fetch_stack(stack_def):
+                fingerprint = fingerprints.get(stack_def.actual_stack_name())
+                if self.streaming():
+                    fetch_resources(stack_def, snapshot, fingerprint, write)
+                    return []
+                # Tables are ordered by stacks.
+                rows = []
+                fetch_resources(stack_def, snapshot, fingerprint, lambda name, row: rows.append((name, row)))
+                return rows
+
+            for rows in self.map_concurrently(fetch_stack, self.stack_defs.values()):
+                for name, row in rows:
+                    write(name, row)
+            if snapshot is not None:
+                snapshot.save()
+
+        self.notice('Fetching resources...')
+        self.__query_targets([
+            Table(
+                'Resources',
+                'Resrouces:',
+                ['StackName', 'LogicalID', 'PhysicalID', 'Type', 'Status', 'UpdatedTime'],
+                ['StackName', 'LogicalID', 'PhysicalID', 'Type'],
+                {
+                    'PhysicalID': lambda physical_id: self.shorten(physical_id or '-', 40, 5),
+                    'Status': self.colord_status,
+                    'UpdatedTime': self.format_datetime
+                }
+            ),
+            Table(
+                'Errors',
+                'Errors:',
+                ['StackName', 'Error'],
+                ['StackName', 'Error'],
+                {'Error': lambda error: yellow(error) if error == STACK_NOT_EXISTS else red(error)},
+                hide_empty = True
+            )
+        ], fetch)
+
+    def list_exports(self):
+        """
+        List exports.
+        """
+        index = self.stack_name_index()
+
+        def fetch(write):
+            for page in self.cfn_client().get_paginator('list_exports').paginate():
+                for export in page['Exports']:
+                    exported_stack_name = stack_name_from_id(export['ExportingStackId'])
+                    # Exported by defined stack, or chained stack.
+                    if index.lookup(exported_stack_name) is not None:
+                        write('Exports', [
+                            exported_stack_name,
+                            export['Name'],
+                            export['Value']
+                        ])
+
+        self.notice('Fetching exports...')
+        self.__query_targets([
+            Table(
+                'Exports',
+                'Exports:',
+                ['ExportedStackName', 'ExportName', 'ExportValue'],
+                ['ExportedStackName', 'ExportName', 'ExportValue']
+            )
+        ], fetch)
+
+    def watch(self, interval = 2, max_interval = 30, events = 10, until_idle = False):
+        """
+        Watch statuses of stacks. Redraw them in place until Ctrl+C.
+        Each refresh calls one ListStacks sweep, and DescribeStackEvents only for stacks changed or in progress.
+
+        :param interval: Seconds between refreshes while any stack is in progress. (Default 2)
+        :param max_interval: Max seconds between refreshes while all stacks are idle. (Default 30)
+        :param events: Number of latest events to show. (Default 10)
+        :param until_idle: Set True to exit when no stack is in progress.
+        """
+        index = self.stack_name_index()
+        watcher = StackWatcher(self.cfn_client(), index.lookup, ACTIVE_STACK_STATUSES, int(events), self.map_concurrently)
+        interval = float(interval)
+        max_interval = float(max_interval)
+        until_idle = until_idle in (True, 'True')
+
+        delay = interval
+        try:
+            while True:
+                changed = watcher.tick()
+                busy = watcher.in_progress()
+                # Refresh quickly while stacks are progressing, back off while idle.
+                delay = interval if busy or changed else min(delay * 2, max_interval)
+                finished = until_idle and not busy
+                self.__print_watch(index, watcher, None if finished else delay)
+                if finished:
+                    return
+                time.sleep(delay)
+        except KeyboardInterrupt:
+            print('')
+
+    def __print_watch(self, index, watcher, delay):
+        if sys.stdout.isatty():
+            # Redraw in place.
+            sys.stdout.write('\x1b[H\x1b[2J')
+
+        rows = []
+        for stack_name, summary in watcher.summaries.items():
+            event = watcher.last_events.get(stack_name)
+            rows.append([
+                index.lookup(stack_name),
+                self.shorten(stack_name, 70, 5),
+                self.colord_status(summary['StackStatus']),
+                self.format_datetime(summary.get('LastUpdatedTime') or summary['CreationTime']),
+                '%s %s' % (event['LogicalResourceId'], event['ResourceStatus']) if event is not None else '-'
+            ])
+        for stack_def in self.stack_defs.values():
+            if stack_def.actual_stack_name() not in watcher.summaries:
+                rows.append([stack_def.stack_alias, stack_def.actual_stack_name(), 'Not created', '-', '-'])
+        self.print_table(
+            'Stacks: (%s%s)' % (
+                '{0:%H:%M:%S}'.format(datetime.datetime.now()),
+                ', next refresh in %ds. ctrl+C to exit' % delay if delay is not None else ''
+            ),
+            ['StackAlias', 'StackName', 'Status', 'UpdatedTime', 'LastEvent'],
+            rows,
+            ['StackAlias', 'StackName', 'LastEvent']
+        )
+
+        self.print_table(
+            'Events(last %d):' % watcher.max_events,
+            ['Timestamp', 'StackName', 'Status', 'LogicalID', 'StatusReason'],
+            [
+                [
+                    self.format_datetime(event['Timestamp']),
+                    self.shorten(stack_name, 40, 5),
+                    self.colord_status(event['ResourceStatus']),
+                    event['LogicalResourceId'],
+                    self.shorten(event.get('ResourceStatusReason', ''), 70, 0)
+                ] for stack_name, event in watcher.events
+            ],
+            ['Timestamp', 'StackName', 'LogicalID', 'StatusReason']
+        )
+        sys.stdout.flush()
+
+    def dryrun(self, show_details = False, actions = None, resource_types = None):
         """
         Turn on DRY-RUN mode for create_xxx, update_xxx task.
         :param show_details: Set True to show change details. (Default False)
+        :param actions: Show only changes of these actions. Separated by semicolon. (Like Add;Remove)
+        :param resource_types: Show only changes of these resource types. Separated by semicolon, wildcard allowed. (Like AWS::IAM::*)
         """
         env.DryRun = True
         env.DryRunShowDetails = show_details or show_details == 'True'
+        env.DryRunActions = actions.split(';') if actions else None
+        env.DryRunResourceTypes = resource_types.split(';') if resource_types else None
         env.NeedConfirm = False
         print(yellow('===== DRY-RUN mode ====='))
 
@@ -551,92 +2112,208 @@ class StackGroup(object):
 
 
 class StackDef(object):
-    def __init__(self, stack_group, stack_alias, stack_name, template_path, **kwargs):
+    def __init__(self, stack_group, stack_alias, stack_name, template_path, depends_on = None, inline_template = None, **kwargs):
         self.stack_group = stack_group
         self.stack_alias = stack_alias
         self.stack_name = stack_name
         self.template_path = template_path
+        self.depends_on = depends_on or []
+        self.inline_template = inline_template
         self.kwargs = kwargs
+        # Keys of parameters not to echo. (NoEcho and SSM references. Collected by resolve_params)
+        self.secret_param_keys = set()
+        # {Parameter key, SSM reference}. Fingerprint identifies them by version instead of value.
+        self.ssm_param_refs = {}
 
     def actual_stack_name(self):
         return self.stack_name % env
 
     def template_s3_url(self):
-        return 'https://s3.amazonaws.com/%s/%s/%s' % (
-            self.stack_group.actual_templates_s3_bucket(),
-            self.stack_group.actual_templates_s3_prefix(),
-            self.template_path
+        return self.stack_group.template_s3_url(self.template_path)
+
+    def template_local_path(self):
+        return self.stack_group.template_local_path(self.template_path)
+
+    def inline(self):
+        return self.inline_template if self.inline_template is not None else self.stack_group.inline_templates_
+
+    def template_location(self):
+        return self.template_local_path() if self.inline() else self.template_s3_url()
+
+    def template_args(self):
+        return self.stack_group.template_args(self.template_path, self.inline())
+
+    def load_template(self):
+        return load_template(self.template_local_path())
+
+    def echo(self, message):
+        # Prefix stack alias while executing stacks concurrently.
+        if env.get('BulkExecution'):
+            with _echo_lock:
+                print('[%s] %s' % (self.stack_alias, message))
+        else:
+            print(message)
+
+    def stack_event_waiter(self):
+        return StackEventWaiter(
+            self.stack_group.cfn_client(),
+            self.actual_stack_name(),
+            self.__echo_event,
+            interrupted = self.stack_group.interrupted
         )
 
+    def __echo_event(self, event):
+        self.echo('  %s %s %s %s %s' % (
+            self.stack_group.format_datetime(event['Timestamp']),
+            self.stack_group.colord_status(event['ResourceStatus']),
+            event['ResourceType'],
+            event['LogicalResourceId'],
+            event.get('ResourceStatusReason', '')
+        ))
+
     def __merge_stack_args(self, **kwargs):
         copied = self.stack_group.default_stack_args_.copy()
         copied.update(**kwargs)  # Override default args by specified args.
         return copied
 
-    def create(self, **kwparams):
-        # Override Fabric env with task parameter.
-        self.stack_group.params(**kwparams)
+    def describe(self):
+        """
+        Describe existing stack.
 
-        # Get template definition.
-        template = self.stack_group.cfn_client().get_template_summary(
-            TemplateURL = self.template_s3_url()
+        :return: Stack description, or None if stack does not exists.
+        """
+        try:
+            return self.stack_group.cfn_client().describe_stacks(
+                StackName = self.actual_stack_name()
+            )['Stacks'][0]
+        except botocore.exceptions.ClientError as e:
+            if 'does not exist' in e.response['Error']['Message']:
+                return None
+            raise e
+
+    def template_summary(self):
+        return self.stack_group.template_summary(self.template_path, self.inline())
+
+    def specified_params(self, template):
+        """
+        Parameters specified by task parameter, fabric env or parameter files. (References are not resolved)
+
+        :param template: Template summary.
+        :return: {Parameter key, Value}
+        """
+        file_params = self.stack_group.file_params(self.stack_alias)
+        specified = {}
+        for param_def in template['Parameters']:
+            param_key = param_def['ParameterKey']
+            if env.has_key(param_key):
+                specified[param_key] = env[param_key]
+            elif file_params.has_key(param_key):
+                specified[param_key] = file_params[param_key]
+        return specified
+
+    def resolve_params(self, template, previous_params = None):
+        """
+        Resolve parameters from task parameter, fabric env, parameter files, prompt.
+        Prompt is skipped by fab --abort-on-prompts, and previous value or default value is used.
+        Previous value is passed by UsePreviousValue, not copied. (NoEcho value of existing stack is ****)
+
+        :param template: Template summary.
+        :param previous_params: Parameters of existing stack. (Only update)
+        :return: Stack parameters.
+        """
+        previous_values = dict(
+            (param['ParameterKey'], param.get('ParameterValue', '')) for param in previous_params or []
         )
+        specified = self.specified_params(template)
+        self.stack_group.prefetch_references(specified.values())
 
-        # Resolve parameters from task parameter, fabric env, prompt.
         stack_params = []
+        self.secret_param_keys = set()
+        self.ssm_param_refs = {}
         for param_def in template['Parameters']:
             param_key = param_def['ParameterKey']
-            if env.has_key(param_key):
+            if param_def.get('NoEcho'):
+                self.secret_param_keys.add(param_key)
+            if specified.has_key(param_key):
                 # Use specified parameter.
-                param_value = env[param_key]
+                reference = parse_reference(specified[param_key])
+                if reference is not None and reference[0] == 'ssm':
+                    self.secret_param_keys.add(param_key)
+                    self.ssm_param_refs[param_key] = specified[param_key]
+                param_value = self.stack_group.resolve_reference(specified[param_key])
             else:
-                if param_def.has_key('DefaultValue'):
-                    default_value = param_def['DefaultValue']
-                    if param_def.has_key('Description'):
-                        # Prompt parameter with description, default value.
-                        param_value = prompt('%s? - %s' % (param_key, param_def['Description']), default = default_value)
-                    else:
-                        # Prompt parameter with default value.
-                        param_value = prompt('%s?' % param_key, default = default_value)
+                # Prompt parameter with previous value or default value.
+                if previous_values.has_key(param_key):
+                    default_value = previous_values[param_key]
                 else:
-                    if param_def.has_key('Description'):
-                        # Prompt parameter with description.
-                        param_value = prompt('%s? - %s' % (param_key, param_def['Description']))
-                    else:
-                        # Prompt parameter.
-                        param_value = prompt('%s?' % param_key)
+                    default_value = param_def.get('DefaultValue', '')
+                if env.abort_on_prompts:
+                    param_value = default_value
+                elif param_def.has_key('Description'):
+                    param_value = prompt('%s? - %s' % (param_key, param_def['Description']), default = default_value)
+                else:
+                    param_value = prompt('%s?' % param_key, default = default_value)
 
-                if not param_value:
+                if not param_value and previous_params is None:
                     raise Exception('Missing require parameter %s.' % (param_key))
 
+                if previous_values.has_key(param_key) and param_value == previous_values[param_key]:
+                    # Keep value of existing stack.
+                    stack_params.append({
+                        'ParameterKey': param_key,
+                        'UsePreviousValue': True
+                    })
+                    continue
+
             stack_params.append({
                 'ParameterKey': param_key,
                 'ParameterValue': param_value
             })
+        return stack_params
 
-        # TODO Async execution.
+    def masked_params(self, stack_params):
+        """
+        Stack parameters to echo. Values of NoEcho parameters and SSM references are masked.
+
+        :param stack_params: Stack parameters.
+        :return: Stack parameters masked.
+        """
+        return [
+            dict(param, ParameterValue = '****')
+            if param['ParameterKey'] in self.secret_param_keys and 'ParameterValue' in param else param
+            for param in stack_params
+        ]
+
+    def create(self, **kwparams):
+        """
+        Create stack.
+
+        :param kwparams: Stack parameters.
+        """
+        # Override Fabric env with task parameter.
+        self.stack_group.params(**kwparams)
+
+        # Get template definition.
+        template = self.template_summary()
+
+        self.execute_create(self.resolve_params(template))
+        self.echo('Finish.')
+
+    def execute_create(self, stack_params):
         # TODO Refactor.
         stack_args = self.__merge_stack_args(**self.kwargs)
         # DRY-RUN. Create ChangeSet and show it.
         if self.stack_group.in_dryrun():
             # Create ChangeSet.
-            print('Creating stack (DRY-RUN)...')
-            print('  Stack Name: %s' % self.actual_stack_name())
-            print('  Template  : %s' % self.template_s3_url())
-            print('  Parameters: %s' % stack_params)
-            print("  Arguments : %s" % stack_args)
-            changeset_name = "dryrun-%s" % ("{0:%Y%m%d%H%M%S}".format(datetime.datetime.now()))
-            self.stack_group.cfn_client().create_change_set(
-                StackName = self.actual_stack_name(),
-                ChangeSetName = changeset_name,
-                ChangeSetType = 'CREATE',
-                TemplateURL = self.template_s3_url(),
-                Parameters = stack_params,
-                **stack_args
-            )
+            self.echo('Creating stack (DRY-RUN)...')
+            self.echo('  Stack Name: %s' % self.actual_stack_name())
+            self.echo('  Template  : %s' % self.template_location())
+            self.echo('  Parameters: %s' % self.masked_params(stack_params))
+            self.echo('  Arguments : %s' % stack_args)
+            changeset_name = self.create_change_set('CREATE', stack_params)
 
             # Wait create ChangeSet complete.
-            print('Computing changes...')
+            self.echo('Computing changes...')
             self.stack_group.cfn_client().get_waiter('change_set_create_complete').wait(
                 StackName = self.actual_stack_name(),
                 ChangeSetName = changeset_name
@@ -647,113 +2324,270 @@ class StackDef(object):
                 StackName = self.actual_stack_name(),
                 ChangeSetName = changeset_name
             )
-            self.__show_change_set(change_set)
+            self.show_change_set(change_set)
 
-            # # Delete ChangeSet with Stack.
-            # self.stack_group.cfn_resource().Stack(self.actual_stack_name()).delete(
-            #     self.__filter_stack_args_for_delete(**stack_args)
-            # )
+            # Keep ChangeSet. create_xxx executes it if template and parameters are not changed.
 
         # Create stack.
         else:
-            print('Creating stack...')
-            print('  Stack Name: %s' % self.actual_stack_name())
-            print('  Template  : %s' % self.template_s3_url())
-            print('  Parameters: %s' % stack_params)
-            print("  Arguments : %s" % stack_args)
-            self.stack_group.cfn_resource().create_stack(
-              StackName = self.actual_stack_name(),
-              TemplateURL = self.template_s3_url(),
-              Parameters = stack_params,
-              **stack_args
-            )
+            self.echo('Creating stack...')
+            self.echo('  Stack Name: %s' % self.actual_stack_name())
+            self.echo('  Template  : %s' % self.template_location())
+            self.echo('  Parameters: %s' % self.masked_params(stack_params))
+            self.echo("  Arguments : %s" % stack_args)
+            self.stack_group.invalidate_snapshot(self.actual_stack_name())
+            waiter = self.stack_event_waiter()
+            # Stack created by DRY-RUN is in review. Other existing stacks fail with AlreadyExists.
+            if waiter.mark() and (self.describe() or {}).get('StackStatus') == 'REVIEW_IN_PROGRESS':
+                # Create it by ChangeSet.
+                reviewed, _ = self.reviewed_change_set(stack_params)
+                if reviewed is None:
+                    self.echo('Computing changes...')
+                    reviewed = self.create_change_set('CREATE', stack_params)
+                    self.stack_group.cfn_client().get_waiter('change_set_create_complete').wait(
+                        StackName = self.actual_stack_name(),
+                        ChangeSetName = reviewed
+                    )
+                self.echo('Executing ChangeSet %s...' % reviewed)
+                self.stack_group.cfn_client().execute_change_set(
+                    StackName = self.actual_stack_name(),
+                    ChangeSetName = reviewed
+                )
+            else:
+                response = self.stack_group.cfn_client().create_stack(
+                  StackName = self.actual_stack_name(),
+                  Parameters = stack_params,
+                  **dict(stack_args, **self.template_args())
+                )
+                waiter.stack_id = response['StackId']
 
             # Wait create complete.
-            print('Waiting for complete... (ctrl+C to exit)')
-            self.stack_group.cfn_client().get_waiter('stack_create_complete').wait(
-                StackName = self.actual_stack_name()
+            self.echo('Waiting for complete... (ctrl+C to exit)')
+            try:
+                waiter.wait('CREATE_COMPLETE')
+            finally:
+                self.stack_group.invalidate_snapshot(self.actual_stack_name())
+            self.save_fingerprint(stack_params)
+
+    def create_change_set(self, change_set_type, stack_params):
+        """
+        Create ChangeSet. (Not wait for complete)
+
+        :param change_set_type: CREATE or UPDATE.
+        :param stack_params: Stack parameters.
+        :return: ChangeSet name.
+        """
+        stack_args = self.__merge_stack_args(**self.kwargs)
+        changeset_name = "dryrun-%s" % ("{0:%Y%m%d%H%M%S}".format(datetime.datetime.now()))
+        fingerprint = self.fingerprint(stack_params)
+        if fingerprint is not None:
+            # Identify template and parameters this ChangeSet computed from.
+            stack_args['Description'] = 'fingerprint:%s' % fingerprint
+        self.stack_group.cfn_client().create_change_set(
+            StackName = self.actual_stack_name(),
+            ChangeSetName = changeset_name,
+            ChangeSetType = change_set_type,
+            Parameters = stack_params,
+            **dict(stack_args, **self.template_args())
+        )
+        return changeset_name
+
+    def fingerprint(self, stack_params):
+        """
+        Fingerprint of template content, parameters and stack arguments.
+        Parameters using previous value are identified by key only, and SSM references by version.
+        Secret values are never hashed, the fingerprint is stored as plain text.
+
+        :param stack_params: Stack parameters. (Resolved by resolve_params)
+        :return: Fingerprint, or None if template is not synchronized or NoEcho parameter is passed by value.
+        """
+        version = self.stack_group.template_version(self.template_path, self.inline())
+        if version is None:
+            return None
+        values = []
+        for param in stack_params:
+            param_key = param['ParameterKey']
+            if 'ParameterValue' not in param:
+                values.append((param_key, None))
+            elif param_key in self.ssm_param_refs:
+                values.append((param_key, self.stack_group.reference_version(self.ssm_param_refs[param_key])))
+            elif param_key in self.secret_param_keys:
+                # Hash of NoEcho value may be guessed offline. Always update.
+                return None
+            else:
+                values.append((param_key, param['ParameterValue']))
+        return content_hash(json.dumps([
+            version,
+            sorted(values),
+            self.__merge_stack_args(**self.kwargs)
+        ], sort_keys = True, default = str).encode('utf-8'))
+
+    def deployed_fingerprint(self, stack_params, stack):
+        """
+        Fingerprint saved for deployed stack. Bound to last updated time, so stacks updated by others are not skipped.
+
+        :param stack_params: Stack parameters deployed.
+        :param stack: Stack description after deployed.
+        :return: Fingerprint, or None if not identified.
+        """
+        fingerprint = self.fingerprint(stack_params)
+        if fingerprint is None:
+            return None
+        return '%s@%s' % (fingerprint, (stack.get('LastUpdatedTime') or stack['CreationTime']).isoformat())
+
+    def save_fingerprint(self, stack_params):
+        """
+        Save fingerprint of deployed stack to SSM parameter, to skip next update if nothing is changed. (If skip_unchanged)
+
+        :param stack_params: Stack parameters deployed.
+        """
+        if not self.stack_group.skip_unchanged_:
+            return
+        stack = self.describe()
+        fingerprint = self.deployed_fingerprint(stack_params, stack) if stack is not None else None
+        if fingerprint is None:
+            # Fingerprint of previous deployment is stale.
+            self.delete_fingerprint()
+            return
+        try:
+            self.stack_group.ssm_client().put_parameter(
+                Name = FINGERPRINT_PARAMETER_PREFIX + self.actual_stack_name(),
+                Value = fingerprint,
+                Type = 'String',
+                Overwrite = True
             )
+        except botocore.exceptions.ClientError as e:
+            # Stack is deployed anyway. It is updated next time.
+            self.echo(yellow('Failed to save fingerprint. %s' % e.response['Error']['Message']))
+
+    def delete_fingerprint(self):
+        if not self.stack_group.skip_unchanged_:
+            return
+        try:
+            self.stack_group.ssm_client().delete_parameter(Name = FINGERPRINT_PARAMETER_PREFIX + self.actual_stack_name())
+        except botocore.exceptions.ClientError:
+            # Not saved.
+            pass
+
+    def unchanged(self, stack, stack_params, fingerprints = None):
+        """
+        Check template, parameters and stack arguments are same as deployed, by fingerprint saved to SSM parameter.
+
+        :param stack: Existing stack description.
+        :param stack_params: Stack parameters.
+        :param fingerprints: Deployed fingerprints. (OPTIONAL. Result of StackGroup#deployed_fingerprints)
+        :return: True if update can be skipped.
+        """
+        if env.get('ForceUpdate'):
+            return False
+        if fingerprints is None:
+            fingerprints = self.stack_group.deployed_fingerprints([stack['StackName']])
+        deployed = fingerprints.get(stack['StackName'])
+        return deployed is not None and deployed == self.deployed_fingerprint(stack_params, stack)
+
+    def deployed_template(self, stack):
+        """
+        Template summary taken from parameters of existing stack. (NoEcho values of existing stack are ****)
+
+        :param stack: Existing stack description.
+        :return: Template summary. (Only Parameters)
+        """
+        return {'Parameters': [
+            {'ParameterKey': param['ParameterKey'], 'NoEcho': param.get('ParameterValue') == '****'}
+            for param in stack.get('Parameters', [])
+        ]}
+
+    def reviewed_change_set(self, stack_params):
+        """
+        Find ChangeSet created by DRY-RUN from current template and parameters.
+
+        :param stack_params: Stack parameters.
+        :return: (Reviewed ChangeSet name or None, Other DRY-RUN ChangeSet names), or (None, None) if stack does not exists.
+        """
+        try:
+            summaries = []
+            paginator = self.stack_group.cfn_client().get_paginator('list_change_sets')
+            for page in paginator.paginate(StackName = self.actual_stack_name()):
+                summaries.extend(
+                    summary for summary in page['Summaries'] if summary['ChangeSetName'].startswith('dryrun-')
+                )
+        except botocore.exceptions.ClientError as e:
+            if 'does not exist' in e.response['Error']['Message']:
+                return None, None
+            raise e
+
+        fingerprint = self.fingerprint(stack_params)
+        reviewed = None
+        for summary in sorted(summaries, key = lambda summary: summary['CreationTime'], reverse = True):
+            if fingerprint is not None \
+                    and summary.get('Description') == 'fingerprint:%s' % fingerprint \
+                    and summary['Status'] == 'CREATE_COMPLETE' \
+                    and summary.get('ExecutionStatus') == 'AVAILABLE':
+                reviewed = summary['ChangeSetName']
+                break
+        return reviewed, [summary['ChangeSetName'] for summary in summaries if summary['ChangeSetName'] != reviewed]
 
-        print('Finish.')
+    def __delete_change_sets(self, change_set_names):
+        for change_set_name in change_set_names:
+            self.echo('Deleting stale ChangeSet %s...' % change_set_name)
+            self.stack_group.cfn_client().delete_change_set(
+                StackName = self.actual_stack_name(),
+                ChangeSetName = change_set_name
+            )
 
     @confirm
     def update(self, **kwparams):
+        """
+        Update stack.
+
+        :param kwparams: Stack parameters.
+        """
         # Override Fabric env with task parameter.
         self.stack_group.params(**kwparams)
 
         # Get exists stack.
-        stack = self.stack_group.cfn_resource().Stack(self.actual_stack_name())
-
-        def get_previous_param_value(param_key):
-            for param in stack.parameters:
-                if param['ParameterKey'] == param_key:
-                    return param['ParameterValue']
-            return None
+        stack = self.describe()
+        if stack is None:
+            abort(red('Stack %s does not exists.' % self.actual_stack_name()))
+
+        # Skip before getting template summary.
+        fingerprints = self.stack_group.deployed_fingerprints([stack['StackName']])
+        if self.stack_group.unchanged_stacks([(self, stack)], fingerprints):
+            self.echo(yellow('No changes. (Same fingerprint as deployed)'))
+            self.echo('Finish.')
+            return
 
         # Get template definition.
-        template = self.stack_group.cfn_client().get_template_summary(
-            TemplateURL = self.template_s3_url()
-        )
+        template = self.template_summary()
 
-        # Resolve parameters from task parameter, fabric env, prompt.
-        stack_params = []
-        for param_def in template['Parameters']:
-            param_key = param_def['ParameterKey']
-            if env.has_key(param_key):
-                # Use specified parameter.
-                param_value = env[param_key]
-            else:
-                prev_value = get_previous_param_value(param_key)
-                if prev_value is not None:
-                    if param_def.has_key('Description'):
-                        # Prompt parameter with description, previous value.
-                        param_value = prompt('%s? - %s' % (param_key, param_def['Description']), default = prev_value)
-                    else:
-                        # Prompt parameter with previous value.
-                        param_value = prompt('%s?' % param_key, default = prev_value)
-                elif param_def.has_key('DefaultValue'):
-                    default_value = param_def['DefaultValue']
-                    if param_def.has_key('Description'):
-                        # Prompt parameter with description, default value.
-                        param_value = prompt('%s? - %s' % (param_key, param_def['Description']), default = default_value)
-                    else:
-                        # Prompt parameter with default value.
-                        param_value = prompt('%s?' % param_key, default = default_value)
-                else:
-                    if param_def.has_key('Description'):
-                        # Prompt parameter with description.
-                        param_value = prompt('%s? - %s' % (param_key, param_def['Description']))
-                    else:
-                        # Prompt parameter.
-                        param_value = prompt('%s?' % param_key)
+        self.execute_update(self.resolve_params(template, stack.get('Parameters', [])), stack, fingerprints)
+        self.echo('Finish.')
 
-            stack_params.append({
-                'ParameterKey': param_key,
-                'ParameterValue': param_value
-            })
+    def execute_update(self, stack_params, stack = None, fingerprints = None):
+        """
+        Update stack, or create ChangeSet in DRY-RUN mode.
+
+        :param stack_params: Stack parameters.
+        :param stack: Existing stack description. Skip update if deployed fingerprint is same. (OPTIONAL)
+        :param fingerprints: Deployed fingerprints. (OPTIONAL. Result of StackGroup#deployed_fingerprints)
+        """
+        if stack is not None and self.unchanged(stack, stack_params, fingerprints):
+            self.echo(yellow('No changes. (Same fingerprint as deployed)'))
+            return
 
-        # TODO Async execution.
         # TODO Refactor.
         stack_args = self.__merge_stack_args(**self.kwargs)
         if self.stack_group.in_dryrun():
             # Create ChangeSet and show it.
-            print('Updating stack (DRY-RUN)...')
-            print('  Stack Name: %s' % self.actual_stack_name())
-            print('  Template  : %s' % self.template_s3_url())
-            print('  Parameters: %s' % stack_params)
-            print('  Arguments : %s' % stack_args)
-            changeset_name = "dryrun-%s" % ("{0:%Y%m%d%H%M%S}".format(datetime.datetime.now()))
-            self.stack_group.cfn_client().create_change_set(
-                StackName = self.actual_stack_name(),
-                ChangeSetName = changeset_name,
-                ChangeSetType = 'UPDATE',
-                TemplateURL = self.template_s3_url(),
-                Parameters = stack_params,
-                **stack_args
-            )
+            self.echo('Updating stack (DRY-RUN)...')
+            self.echo('  Stack Name: %s' % self.actual_stack_name())
+            self.echo('  Template  : %s' % self.template_location())
+            self.echo('  Parameters: %s' % self.masked_params(stack_params))
+            self.echo('  Arguments : %s' % stack_args)
+            changeset_name = self.create_change_set('UPDATE', stack_params)
 
             # Wait create ChangeSet complete.
-            print('Computing changes...')
+            self.echo('Computing changes...')
             try:
                 self.stack_group.cfn_client().get_waiter('change_set_create_complete').wait(
                     StackName = self.actual_stack_name(),
@@ -769,61 +2603,84 @@ class StackDef(object):
                 ChangeSetName = changeset_name
             )
             if change_set.has_key('StatusReason') and 'didn\'t contain changes' in change_set['StatusReason']:
-                print(yellow('No changes.'))
+                self.echo(yellow('No changes.'))
             else:
-                self.__show_change_set(change_set)
+                self.show_change_set(change_set)
 
-            # # Delete ChaneSet.
-            # self.stack_group.cfn_client().delete_change_set(
-            #     StackName = self.actual_stack_name(),
-            #     ChangeSetName = changeset_name
-            # )
+            # Keep ChangeSet. update_xxx executes it if template and parameters are not changed.
 
         # Update stack.
         else:
-            print('Updating stack...')
-            print('  Stack Name: %s' % self.actual_stack_name())
-            print('  Template  : %s' % self.template_s3_url())
-            print('  Parameters: %s' % stack_params)
-            print('  Arguments : %s' % stack_args)
+            self.echo('Updating stack...')
+            self.echo('  Stack Name: %s' % self.actual_stack_name())
+            self.echo('  Template  : %s' % self.template_location())
+            self.echo('  Parameters: %s' % self.masked_params(stack_params))
+            self.echo('  Arguments : %s' % stack_args)
+            self.stack_group.invalidate_snapshot(self.actual_stack_name())
+            waiter = self.stack_event_waiter()
+            waiter.mark()
+            reviewed, stale = self.reviewed_change_set(stack_params)
             try:
-                stack.update(
-                    TemplateURL = self.template_s3_url(),
-                    Parameters = stack_params,
-                    **stack_args
-                )
+                if reviewed is not None:
+                    # Apply changes reviewed by DRY-RUN.
+                    self.echo('Executing reviewed ChangeSet %s...' % reviewed)
+                    self.stack_group.cfn_client().execute_change_set(
+                        StackName = self.actual_stack_name(),
+                        ChangeSetName = reviewed
+                    )
+                else:
+                    self.__delete_change_sets(stale or [])
+                    self.stack_group.cfn_client().update_stack(
+                        StackName = self.actual_stack_name(),
+                        Parameters = stack_params,
+                        **dict(stack_args, **self.template_args())
+                    )
             except botocore.exceptions.ClientError as e:
                 if 'No updates are to be performed' in e.args[0]:
-                    print(yellow('No changes.'))
+                    self.echo(yellow('No changes.'))
+                    self.save_fingerprint(stack_params)
                 else:
                     raise e
             else:
                 # Wait update complete.
-                print('Waiting for complete... (ctrl+C to exit)')
-                self.stack_group.cfn_client().get_waiter('stack_update_complete').wait(
-                    StackName = self.actual_stack_name()
-                )
-
-        print('Finish.')
+                self.echo('Waiting for complete... (ctrl+C to exit)')
+                try:
+                    waiter.wait('UPDATE_COMPLETE')
+                finally:
+                    self.stack_group.invalidate_snapshot(self.actual_stack_name())
+                self.save_fingerprint(stack_params)
 
     @confirm
     def delete(self):
-        # TODO Async execution.
+        """
+        Delete stack.
+        """
+        self.execute_delete()
+        self.echo('Finish.')
+
+    def execute_delete(self):
         # Delete stack.
         stack_args = self.__filter_stack_args_for_delete(**self.__merge_stack_args(**self.kwargs))
-        print('Deleting stack...')
-        print('  Stack Name: %s' % self.actual_stack_name())
-        print('  Arguments : %s' % stack_args)
-        self.stack_group.cfn_resource().Stack(self.actual_stack_name()).delete(
+        self.echo('Deleting stack...')
+        self.echo('  Stack Name: %s' % self.actual_stack_name())
+        self.echo('  Arguments : %s' % stack_args)
+        waiter = self.stack_event_waiter()
+        if not waiter.mark():
+            self.echo(yellow('Stack %s does not exists.' % self.actual_stack_name()))
+            return
+        self.stack_group.invalidate_snapshot(self.actual_stack_name())
+        self.stack_group.cfn_client().delete_stack(
+            StackName = self.actual_stack_name(),
             **stack_args
         )
 
         # Wait delete complete.
-        print('Waiting for complete... (ctrl+C to exit)')
-        self.stack_group.cfn_client().get_waiter('stack_delete_complete').wait(
-            StackName = self.actual_stack_name()
-        )
-        print('Finish.')
+        self.echo('Waiting for complete... (ctrl+C to exit)')
+        try:
+            waiter.wait('DELETE_COMPLETE')
+        finally:
+            self.stack_group.invalidate_snapshot(self.actual_stack_name())
+        self.delete_fingerprint()
 
     def __filter_stack_args_for_delete(self, **kwargs):
         accept_arg_names = ['RetainResources', 'RoleARN']
@@ -833,9 +2690,63 @@ class StackDef(object):
                 filtered[key] = value
         return filtered
 
-    def __show_change_set(self, change_set):
+    def iter_changes(self, change_set):
+        """
+        Iterate all changes of ChangeSet. Following pages are fetched while iterating.
+
+        :param change_set: First page of ChangeSet. (describe_change_set response)
+        :return: Iterator of changes.
+        """
+        page = change_set
+        while True:
+            for change in page.get('Changes', []):
+                yield change
+            if not page.get('NextToken'):
+                return
+            page = self.stack_group.cfn_client().describe_change_set(
+                StackName = change_set['StackName'],
+                ChangeSetName = change_set['ChangeSetName'],
+                NextToken = page['NextToken']
+            )
+
+    def count_changes(self, change_set):
+        """
+        Count changes of all pages of ChangeSet.
+
+        :param change_set: First page of ChangeSet. (describe_change_set response)
+        :return: {Action: count, 'Replacement': count}
+        """
+        counts = OrderedDict([('Add', 0), ('Modify', 0), ('Remove', 0), ('Replacement', 0)])
+        for change in self.iter_changes(change_set):
+            resource_change = change['ResourceChange']
+            counts[resource_change['Action']] = counts.get(resource_change['Action'], 0) + 1
+            if resource_change.get('Replacement') in ('True', 'Conditional'):
+                counts['Replacement'] += 1
+        return counts
+
+    def __match_change(self, resource_change):
+        # Filter changes by dryrun:actions=...,resource_types=...
+        actions = env.get('DryRunActions')
+        resource_types = env.get('DryRunResourceTypes')
+        if actions and resource_change['Action'] not in actions:
+            return False
+        if resource_types and not any(
+                fnmatch.fnmatch(resource_change['ResourceType'], pattern) for pattern in resource_types):
+            return False
+        return True
+
+    def __print_changes(self, rows):
+        table = prettytable.PrettyTable(['Action', 'LogicalID', 'PhysicalID', 'ResourceType', 'Replacement'])
+        table.align['LogicalID'] = 'l'
+        table.align['PhysicalID'] = 'l'
+        table.align['ResourceType'] = 'l'
+        for row in rows:
+            table.add_row(row)
+        print(table)
+
+    def show_change_set(self, change_set):
         print(blue('Stack:', bold = True))
-        table = PrettyTable()
+        table = prettytable.PrettyTable()
         table.add_column('StackName', [change_set['StackName']])
         table.align['StackName'] = 'l'
         table.add_column('ChangeSetName', [change_set['ChangeSetName']])
@@ -847,40 +2758,60 @@ class StackDef(object):
         if change_set.has_key('Parameters') is False:
             print('No parameters.')
         else:
-            table = PrettyTable(['Key', 'Value'])
+            table = prettytable.PrettyTable(['Key', 'Value'])
             table.align['Key'] = 'l'
             table.align['Value'] = 'l'
-            for param in change_set['Parameters']:
+            for param in self.masked_params(change_set['Parameters']):
                 table.add_row([
                     param['ParameterKey'],
                     param['ParameterValue']
                 ])
             print(table)
 
+        # Render changes page by page. Only CHANGE_TABLE_ROWS rows are kept in memory.
         print(blue('Changes:', bold = True))
-        if change_set.has_key('Changes') is False:
+        counts = OrderedDict([('Add', 0), ('Modify', 0), ('Remove', 0), ('Replacement', 0)])
+        total = 0
+        rows = []
+        for change in self.iter_changes(change_set):
+            resource_change = change['ResourceChange']
+            total += 1
+            if not self.__match_change(resource_change):
+                continue
+            counts[resource_change['Action']] = counts.get(resource_change['Action'], 0) + 1
+            if resource_change.get('Replacement') in ('True', 'Conditional'):
+                counts['Replacement'] += 1
+            rows.append([
+                resource_change['Action'],
+                resource_change['LogicalResourceId'],
+                self.stack_group.shorten(resource_change['PhysicalResourceId'], 70, 10) if resource_change.has_key('PhysicalResourceId') else '-',
+                resource_change['ResourceType'],
+                resource_change['Replacement'] if resource_change.has_key('Replacement') else '-'
+            ])
+            if len(rows) >= CHANGE_TABLE_ROWS:
+                self.__print_changes(rows)
+                rows = []
+        if rows:
+            self.__print_changes(rows)
+
+        if total == 0:
             print(yellow('No changes.'))
-        else:
-            table = PrettyTable(['Action', 'LogicalID', 'PhysicalID', 'ResourceType', 'Replacement'])
-            table.align['LogicalID'] = 'l'
-            table.align['PhysicalID'] = 'l'
-            table.align['ResourceType'] = 'l'
-            for change in change_set['Changes']:
-                resource_change = change['ResourceChange']
-                table.add_row([
-                    resource_change['Action'],
-                    resource_change['LogicalResourceId'],
-                    self.stack_group.shorten(resource_change['PhysicalResourceId'], 70, 10) if resource_change.has_key('PhysicalResourceId') else '-',
-                    resource_change['ResourceType'],
-                    resource_change['Replacement'] if resource_change.has_key('Replacement') else '-'
-                ])
-            print(table)
+            return
+        shown = sum(count for action, count in counts.items() if action != 'Replacement')
+        print('%s (Replacement: %d)%s' % (
+            ', '.join('%s: %d' % (action, count) for action, count in counts.items() if action != 'Replacement'),
+            counts['Replacement'],
+            '' if shown == total else ' - %d of %d changes shown.' % (shown, total)
+        ))
 
-            if env.DryRunShowDetails:
-                print(blue('Details:', bold = True))
-                print('---------------------------------------------------------------------------------------')
-                print(json.dumps(change_set['Changes'], indent=2, sort_keys=True))
-                print('---------------------------------------------------------------------------------------')
+        if env.DryRunShowDetails:
+            # Stream details change by change. (Pages are fetched again)
+            print(blue('Details:', bold = True))
+            print('---------------------------------------------------------------------------------------')
+            for change in self.iter_changes(change_set):
+                if self.__match_change(change['ResourceChange']):
+                    print(json.dumps(change, indent=2, sort_keys=True))
+            print('---------------------------------------------------------------------------------------')
 
     def get_stack_operations(self):
         return [self.create, self.update, self.delete]
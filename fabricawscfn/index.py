@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Index of defined stack names.
+"""
+
+
+class StackNameIndex(object):
+    """
+    Resolve stack name to defined stack alias.
+
+    Exact stack names are resolved by dict. Chained stacks(Named like "<defined stack name>-xxx")
+    are resolved by prefix trie, so lookup cost depends on the length of stack name only.
+    """
+
+    def __init__(self):
+        self.exact = {}
+        self.trie = {}
+
+    def add(self, stack_name, stack_alias):
+        """
+        Add defined stack.
+
+        :param stack_name: Actual stack name.
+        :param stack_alias: Stack alias.
+        :return: self
+        """
+        self.exact[stack_name] = stack_alias
+        node = self.trie
+        for char in stack_name:
+            node = node.setdefault(char, {})
+        node[None] = stack_alias
+        return self
+
+    def lookup(self, stack_name):
+        """
+        Resolve stack alias of stack name.
+
+        :param stack_name: Stack name.
+        :return: Alias of defined stack(Or parent stack of chained stack), or None if not in stack group.
+        """
+        if stack_name in self.exact:
+            return self.exact[stack_name]
+
+        # Longest defined stack name followed by '-'.
+        found = None
+        node = self.trie
+        for i, char in enumerate(stack_name):
+            if char == '-' and None in node:
+                found = node[None]
+            node = node.get(char)
+            if node is None:
+                break
+        return found
+
+
+def stack_name_from_id(stack_id):
+    """
+    Parse stack name from stack id.
+
+    :param stack_id: Stack id.(ARN like arn:aws:cloudformation:REGION:ACCOUNT:stack/NAME/UUID)
+    :return: Stack name.
+    """
+    return stack_id.split(':', 5)[-1].split('/')[1]
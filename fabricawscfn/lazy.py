@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Lazy module import.
+"""
+import importlib
+
+
+class LazyModule(object):
+    """
+    Module imported on first attribute access.
+    Heavy dependencies(boto3, botocore, prettytable, yaml) are not loaded until they are used.
+    """
+
+    def __init__(self, name):
+        """
+        Create LazyModule.
+
+        :param name: Module name. (Like botocore)
+        """
+        self.__name = name
+        self.__module = None
+
+    def __getattr__(self, attr):
+        if self.__module is None:
+            self.__module = importlib.import_module(self.__name)
+        try:
+            return getattr(self.__module, attr)
+        except AttributeError:
+            # Submodule not imported yet. (Like botocore.exceptions)
+            return importlib.import_module('%s.%s' % (self.__name, attr))
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Output of list and describe tasks.
+"""
+from __future__ import print_function
+from collections import OrderedDict
+import csv
+import datetime
+import json
+import sys
+import threading
+
+from fabric.colors import blue
+
+# Machine readable output formats. Rows are written as soon as fetched.
+OUTPUT_FORMATS = ['json', 'jsonl', 'csv']
+
+
+class Table(object):
+    """
+    Definition of an output table.
+    """
+
+    def __init__(self, name, title, columns, align_left = (), formats = None,
+                 empty_message = None, hide_empty = False, required = False):
+        """
+        Create Table.
+
+        :param name: Table name. (Written as Table field by machine readable formats)
+        :param title: Title printed above table.
+        :param columns: Column names.
+        :param align_left: Left aligned columns.
+        :param formats: Functions format cell for console. {Column name, Function} (Like coloring, shortening)
+        :param empty_message: Message printed instead of empty table. (OPTIONAL)
+        :param hide_empty: Set True not to print empty table.
+        :param required: Set True not to print any tables if this table is empty.
+        """
+        self.name = name
+        self.title = title
+        self.columns = list(columns)
+        self.align_left = align_left
+        self.formats = formats or {}
+        self.empty_message = empty_message
+        self.hide_empty = hide_empty
+        self.required = required
+
+
+class TableWriter(object):
+    """
+    Buffer rows, and print formatted PrettyTables on close.
+    """
+
+    def __init__(self, tables, print_table):
+        """
+        Create TableWriter.
+
+        :param tables: Tables.
+        :param print_table: Function prints title, columns, rows and left aligned columns.
+        """
+        self.tables = tables
+        self.print_table = print_table
+        self.rows = dict((table.name, []) for table in tables)
+        self.lock = threading.Lock()
+
+    def write(self, name, row):
+        with self.lock:
+            self.rows[name].append(row)
+
+    def close(self):
+        if any(table.required and not self.rows[table.name] for table in self.tables):
+            return
+        for table in self.tables:
+            rows = self.rows[table.name]
+            if not rows and table.hide_empty:
+                continue
+            if not rows and table.empty_message is not None:
+                print(blue(table.title, bold = True))
+                print(table.empty_message)
+                continue
+            formats = [table.formats.get(column) for column in table.columns]
+            self.print_table(
+                table.title,
+                table.columns,
+                [
+                    [format(value) if format is not None else value for format, value in zip(formats, row)]
+                    for row in rows
+                ],
+                table.align_left
+            )
+
+
+def _raw(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    # csv module of Python 2 writes only byte strings.
+    if sys.version_info[0] < 3 and isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+class RecordWriter(object):
+    """
+    Write each row as a record as soon as it is written. Values are not colored nor shortened.
+    Records have Table field if there are multiple tables.
+
+    * json: An array of objects.
+    * jsonl: An object per line.
+    * csv: A header of all columns, and a line per row.
+    """
+
+    def __init__(self, output_format, tables, stream = None):
+        """
+        Create RecordWriter.
+
+        :param output_format: json, jsonl or csv.
+        :param tables: Tables.
+        :param stream: Output stream. (Default stdout)
+        """
+        self.output_format = output_format
+        self.tables = dict((table.name, table) for table in tables)
+        self.with_table = len(tables) > 1
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+        self.records = 0
+
+        if output_format == 'csv':
+            columns = ['Table'] if self.with_table else []
+            for table in tables:
+                for column in table.columns:
+                    if column not in columns:
+                        columns.append(column)
+            self.csv = csv.DictWriter(self.stream, columns, lineterminator = '\n')
+            self.csv.writeheader()
+        elif output_format == 'json':
+            self.stream.write('[')
+
+    def write(self, name, row):
+        record = OrderedDict([('Table', name)] if self.with_table else [])
+        record.update((column, _raw(value)) for column, value in zip(self.tables[name].columns, row))
+        with self.lock:
+            if self.output_format == 'csv':
+                self.csv.writerow(dict((column, _csv_value(value)) for column, value in record.items()))
+            elif self.output_format == 'json':
+                self.stream.write('%s\n  %s' % (',' if self.records else '', json.dumps(record)))
+            else:
+                self.stream.write(json.dumps(record) + '\n')
+            self.records += 1
+            self.stream.flush()
+
+    def close(self):
+        if self.output_format == 'json':
+            self.stream.write('\n]\n' if self.records else ']\n')
+            self.stream.flush()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Stack parameter files and references.
+"""
+import json
+import re
+
+from .lazy import LazyModule
+
+yaml = LazyModule('yaml')
+
+# Max names of an SSM GetParameters call.
+SSM_BATCH_SIZE = 10
+
+# Parameter value refers other value. {{ssm:NAME}} or {{output:STACK.OUTPUT_KEY}}
+REFERENCE_PATTERN = re.compile(r'^\{\{(ssm|output):(.+)\}\}$')
+
+
+def parse_reference(value):
+    """
+    Parse parameter value referring SSM parameter or stack output.
+
+    :param value: Parameter value.
+    :return: (ssm, Parameter name) or (output, STACK.OUTPUT_KEY), or None if value is not a reference.
+    """
+    if not isinstance(value, basestring):
+        return None
+    match = REFERENCE_PATTERN.match(value.strip())
+    if match is None:
+        return None
+    return match.group(1), match.group(2).strip()
+
+
+def _param_value(key, value):
+    # CloudFormation parameters are strings. Lists are CommaDelimitedList.
+    if value is None:
+        # Empty YAML value(Key:) is not deployed as "None".
+        raise ValueError("Parameter %s has no value. (Use '' for empty string)" % key)
+    if isinstance(value, list):
+        return ','.join(_param_value(key, item) for item in value)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, basestring):
+        return value
+    return str(value)
+
+
+def load_params_file(path):
+    """
+    Load parameter file(YAML or JSON).
+    Top level values apply to all stacks, mappings under stack alias apply to the stack only.
+
+        EnvName: prod
+        VpcId: '{{output:network.VpcId}}'
+        database:
+          Password: '{{ssm:/prod/database/password}}'
+
+    :param path: File path.
+    :return: (Parameters of all stacks, {Stack alias, Parameters of stack})
+    :raise ValueError: If a parameter has no value.
+    """
+    with open(path) as f:
+        if path.endswith('.json'):
+            document = json.load(f)
+        else:
+            document = yaml.safe_load(f)
+
+    common = {}
+    stacks = {}
+    for key, value in (document or {}).items():
+        if isinstance(value, dict):
+            stacks[key] = dict(
+                (param_key, _param_value(param_key, param_value)) for param_key, param_value in value.items()
+            )
+        else:
+            common[key] = _param_value(key, value)
+    return common, stacks
+
+
+def chunks(items, size):
+    """
+    Split items into lists of size.
+    """
+    return [items[i:i + size] for i in range(0, len(items), size)]
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentation of AWS API calls.
+"""
+from collections import OrderedDict
+import json
+import os
+import threading
+import time
+
+# Upper bounds(ms) of latency histogram buckets.
+LATENCY_BUCKETS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+# Error codes treated as throttling. (Same as botocore)
+THROTTLE_ERROR_CODES = set([
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException',
+    'TooManyRequestsException', 'ProvisionedThroughputExceededException', 'TransactionInProgressException',
+    'RequestLimitExceeded', 'BandwidthLimitExceeded', 'LimitExceededException', 'RequestThrottled',
+    'SlowDown', 'PriorRequestNotComplete', 'EC2ThrottledException'
+])
+
+
+class OperationStats(object):
+    """
+    Statistics of an API operation.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttles = 0
+        self.total = 0.0
+        self.max = 0.0
+        # Last bucket counts calls over LATENCY_BUCKETS.
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, elapsed, error, retries):
+        self.calls += 1
+        self.errors += 1 if error else 0
+        self.retries += retries
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        elapsed_ms = elapsed * 1000
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed_ms <= bound:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def percentile(self, ratio):
+        """
+        Estimate percentile from histogram.
+
+        :param ratio: Percentile. (0.0 - 1.0)
+        :return: Upper bound(ms) of bucket, or max latency if over all buckets.
+        """
+        threshold = self.calls * ratio
+        count = 0
+        for bound, bucket in zip(LATENCY_BUCKETS, self.histogram):
+            count += bucket
+            if count >= threshold:
+                return bound
+        return self.max * 1000
+
+
+class ApiProfiler(object):
+    """
+    Collects per-operation call counts, latency histograms, retries and throttles of botocore clients,
+    and wall time of tasks. Optionally records timeline as Chrome trace. (chrome://tracing)
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_path = None
+        self.lock = threading.Lock()
+        self.started = time.time()
+        # {(Service, Operation), OperationStats}
+        self.operations = OrderedDict()
+        # [(Task name, Elapsed)]
+        self.tasks = []
+        self.trace_events = []
+        # {Thread ID, Thread name}
+        self.trace_threads = {}
+
+    def enable(self, trace_path = None):
+        """
+        Start collecting.
+
+        :param trace_path: Chrome trace JSON file path written by save_trace. (OPTIONAL)
+        """
+        self.enabled = True
+        self.trace_path = trace_path
+
+    def attach(self, client):
+        """
+        Hook botocore events of client.
+
+        :param client: botocore client.
+        """
+        events = client.meta.events
+        events.register('before-call.*.*', self.__before_call)
+        events.register('after-call.*.*', self.__after_call)
+        events.register('after-call-error.*.*', self.__after_call_error)
+        events.register('needs-retry.*.*', self.__needs_retry)
+
+    def __before_call(self, model, context, **kwargs):
+        context['profiler_started'] = time.time()
+        # after-call-error does not pass operation model.
+        context['profiler_model'] = model
+
+    def __after_call(self, http_response, parsed, context, **kwargs):
+        error = http_response is not None and http_response.status_code >= 300
+        retries = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0) if parsed else 0
+        self.__record(context, error, retries)
+
+    def __after_call_error(self, context, **kwargs):
+        # Connection error or timeout. (Passed only exception and context)
+        self.__record(context, True, 0)
+
+    def __needs_retry(self, response, operation, **kwargs):
+        if response is None:
+            return
+        code = response[1].get('Error', {}).get('Code')
+        if code in THROTTLE_ERROR_CODES:
+            with self.lock:
+                self.__stats(operation).throttles += 1
+
+    def __stats(self, model):
+        key = (model.service_model.service_name, model.name)
+        if key not in self.operations:
+            self.operations[key] = OperationStats()
+        return self.operations[key]
+
+    def __record(self, context, error, retries):
+        started = context.pop('profiler_started', None)
+        model = context.pop('profiler_model', None)
+        if started is None or model is None:
+            return
+        ended = time.time()
+        with self.lock:
+            self.__stats(model).add(ended - started, error, retries)
+            if self.trace_path is not None:
+                self.__trace(model.name, 'aws', started, ended, dict(
+                    service = model.service_model.service_name, error = error, retries = retries
+                ))
+
+    def task(self, task_name, func):
+        """
+        Wrap task function to measure wall time.
+
+        :param task_name: Task name.
+        :param func: Task function.
+        :return: Wrapped function.
+        """
+        def timed(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            started = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                ended = time.time()
+                with self.lock:
+                    self.tasks.append((task_name, ended - started))
+                    if self.trace_path is not None:
+                        self.__trace(task_name, 'task', started, ended, {})
+        timed.__doc__ = func.__doc__
+        # Fabric shows arguments of original function by fab -d.
+        timed.wrapped = func
+        return timed
+
+    def __trace(self, name, category, started, ended, args):
+        thread = threading.current_thread()
+        self.trace_threads[thread.ident] = thread.name
+        self.trace_events.append(dict(
+            name = name,
+            cat = category,
+            ph = 'X',
+            ts = int((started - self.started) * 1000000),
+            dur = int((ended - started) * 1000000),
+            pid = os.getpid(),
+            tid = thread.ident,
+            args = args
+        ))
+
+    def save_trace(self):
+        """
+        Write Chrome trace JSON. (Open by chrome://tracing or Perfetto)
+        """
+        with self.lock:
+            events = [
+                dict(name = 'thread_name', ph = 'M', pid = os.getpid(), tid = tid, args = dict(name = name))
+                for tid, name in self.trace_threads.items()
+            ] + self.trace_events
+        trace_dir = os.path.dirname(self.trace_path)
+        if trace_dir and not os.path.isdir(trace_dir):
+            os.makedirs(trace_dir)
+        with open(self.trace_path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Rate limiter for AWS API calls.
+"""
+import threading
+import time
+
+from .profiler import THROTTLE_ERROR_CODES
+
+# Initial requests per second of API operations. {(Service, Operation), Rate}
+DEFAULT_RATES = {
+    ('cloudformation', 'CreateChangeSet'): 2,
+}
+
+# Initial requests per second of other API operations of service, applied after first throttled.
+# Services not listed are not limited. (Like s3)
+SERVICE_RATES = {
+    'cloudformation': 25,
+    'ssm': 10,
+}
+
+# Rate is increased up to this times of initial rate while not throttled.
+MAX_RATE_RATIO = 4
+
+
+class RateLimiter(object):
+    """
+    Token bucket rate limiter shared by threads.
+
+    Adaptive if succeeded and throttled are notified. Rate is halved on throttled,
+    and recovers slowly by each succeeded call up to max_rate.
+    """
+
+    def __init__(self, rate, burst = 1, min_rate = 0.1, max_rate = None, increase = 0.1, decrease = 0.5,
+                 lazy = False):
+        """
+        Create RateLimiter.
+
+        :param rate: Tokens per second.
+        :param burst: Max tokens stored.
+        :param min_rate: Min tokens per second after throttled.
+        :param max_rate: Max tokens per second recovered to. (Default rate)
+        :param increase: Tokens per second increased by each succeeded call.
+        :param decrease: Ratio of rate decreased to on throttled.
+        :param lazy: Set True not to limit until first throttled.
+        """
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.min_rate = float(min(min_rate, rate))
+        self.max_rate = float(max_rate if max_rate is not None else rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.tokens = float(burst)
+        self.updated = time.time()
+        self.decreased = 0
+        self.limiting = not lazy
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token. Block until a token is available.
+        """
+        if not self.limiting:
+            return
+        while True:
+            with self.lock:
+                now = time.time()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def succeeded(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def throttled(self):
+        with self.lock:
+            now = time.time()
+            # Calls in flight are throttled together. Decrease once per a second.
+            if now - self.decreased < 1:
+                return
+            self.decreased = now
+            self.limiting = True
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = 0
+
+
+class OperationRateLimiter(object):
+    """
+    Adaptive RateLimiter per API operation and region, applied to each HTTP attempt(including retries) of botocore clients.
+    Operations of DEFAULT_RATES or set_rate start at their initial rate. Other operations are not limited until throttled.
+    Then slow down on throttled and speed up slowly while succeeded.
+    """
+
+    def __init__(self, rates = None):
+        """
+        Create OperationRateLimiter.
+
+        :param rates: Initial requests per second. {(Service, Operation), Rate} (Override DEFAULT_RATES)
+        """
+        self.rates = dict(DEFAULT_RATES)
+        self.rates.update(rates or {})
+        self.limiters = {}
+        self.lock = threading.Lock()
+
+    def set_rate(self, service_name, operation_name, rate):
+        """
+        Set initial requests per second of API operation.
+
+        :param service_name: Service name. (Like cloudformation)
+        :param operation_name: Operation name. (Like CreateChangeSet)
+        :param rate: Requests per second.
+        """
+        with self.lock:
+            self.rates[(service_name, operation_name)] = float(rate)
+            for key in [key for key in self.limiters.keys() if key[1:] == (service_name, operation_name)]:
+                del self.limiters[key]
+
+    def limiter(self, region, service_name, operation_name):
+        """
+        Get limiter of API operation.
+
+        :return: RateLimiter, or None if not limited.
+        """
+        key = (region, service_name, operation_name)
+        with self.lock:
+            if key not in self.limiters:
+                rate = self.rates.get((service_name, operation_name))
+                lazy = rate is None
+                if lazy:
+                    rate = SERVICE_RATES.get(service_name)
+                # Allow burst of a second.
+                self.limiters[key] = RateLimiter(
+                    rate, burst = max(1, rate), max_rate = rate * MAX_RATE_RATIO, lazy = lazy
+                ) if rate else None
+            return self.limiters[key]
+
+    def attach(self, client):
+        """
+        Pass all HTTP attempts of client through limiter. (Retries are sent inside botocore endpoint, not by before-call)
+
+        :param client: botocore client.
+        """
+        region = client.meta.region_name
+        service_name = client.meta.service_model.service_name
+
+        def before_send(event_name, **kwargs):
+            # Event name is before-send.[Service ID].[Operation name]
+            limiter = self.limiter(region, service_name, event_name.rsplit('.', 1)[-1])
+            if limiter is not None:
+                limiter.acquire()
+
+        def after_call(http_response, model, **kwargs):
+            limiter = self.limiter(region, service_name, model.name)
+            if limiter is not None and http_response is not None and http_response.status_code < 300:
+                limiter.succeeded()
+
+        def needs_retry(response, operation, **kwargs):
+            limiter = self.limiter(region, service_name, operation.name)
+            if limiter is not None and response is not None \
+                    and response[1].get('Error', {}).get('Code') in THROTTLE_ERROR_CODES:
+                limiter.throttled()
+
+        client.meta.events.register('before-send.*.*', before_send)
+        client.meta.events.register('after-call.*.*', after_call)
+        client.meta.events.register('needs-retry.*.*', needs_retry)
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def shared_rate_limiter():
+    """
+    Get OperationRateLimiter shared in process.
+
+    :return: OperationRateLimiter.
+    """
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = OperationRateLimiter()
+        return _shared_limiter
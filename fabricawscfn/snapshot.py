@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Local snapshot of stack state.
+"""
+import datetime
+import json
+import os
+import threading
+import time
+
+from .lazy import LazyModule
+
+date_parser = LazyModule('dateutil.parser')
+
+
+def _encode(value):
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError('%r is not JSON serializable' % value)
+
+
+def _decode(value):
+    if '__datetime__' in value:
+        return date_parser.parse(value['__datetime__'])
+    return value
+
+
+def stack_fingerprint(summary):
+    """
+    Fingerprint of stack state. Changed when stack status or last updated time are changed.
+
+    :param summary: Stack summary.
+    :return: Fingerprint.
+    """
+    updated_time = summary.get('LastUpdatedTime') or summary.get('CreationTime')
+    return [summary['StackStatus'], updated_time.isoformat() if updated_time is not None else None]
+
+
+class StackSnapshot(object):
+    """
+    Snapshot of stack summaries, details and resources of an AWS target, persisted to JSON file.
+
+    Stack summaries are expired by TTL, or by any stack changed. Details and resources of each stack are kept
+    while fingerprint(stack status and last updated time) of stack is not changed.
+    """
+
+    def __init__(self, path, ttl):
+        """
+        Create StackSnapshot.
+
+        :param path: JSON file path.
+        :param ttl: Seconds stack summaries are valid.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self.data = self.__load()
+
+    def summaries(self):
+        """
+        Get stack summaries.
+
+        :return: Stack summaries, or None if expired or any stack is changed.
+        """
+        with self.lock:
+            if self.__expired() or self.data.get('changed'):
+                return None
+            return self.data['summaries']
+
+    def fingerprints(self):
+        """
+        Get fingerprints of stacks in stack summaries not expired. Stacks changed since then are not included.
+
+        :return: {Stack name, Fingerprint}
+        """
+        with self.lock:
+            if self.__expired():
+                return {}
+            changed = set(self.data.get('changed', []))
+            return dict(
+                (summary['StackName'], stack_fingerprint(summary)) for summary in self.data['summaries']
+                if summary['StackName'] not in changed
+            )
+
+    def put_summaries(self, summaries):
+        with self.lock:
+            self.data['summaries'] = summaries
+            self.data['summaries_fetched_at'] = time.time()
+            self.data['changed'] = []
+
+    def get(self, stack_name, kind, fingerprint):
+        """
+        Get cached stack state.
+
+        :param stack_name: Stack name.
+        :param kind: Kind of state. (Like details, resources)
+        :param fingerprint: Current fingerprint of stack.
+        :return: Cached state, or None if not cached or stack is changed.
+        """
+        with self.lock:
+            entry = self.data['stacks'].get(stack_name)
+            if entry is None or entry['fingerprint'] != fingerprint:
+                return None
+            return entry.get(kind)
+
+    def put(self, stack_name, kind, fingerprint, value):
+        with self.lock:
+            entry = self.data['stacks'].get(stack_name)
+            if entry is None or entry['fingerprint'] != fingerprint:
+                entry = self.data['stacks'][stack_name] = {'fingerprint': fingerprint}
+            entry[kind] = value
+
+    def invalidate(self, stack_name):
+        """
+        Invalidate stack state. (Call when stack is changed)
+
+        :param stack_name: Stack name.
+        """
+        with self.lock:
+            self.data['stacks'].pop(stack_name, None)
+            changed = self.data.setdefault('changed', [])
+            if stack_name not in changed:
+                changed.append(stack_name)
+
+    def save(self):
+        with self.lock:
+            snapshot_dir = os.path.dirname(self.path)
+            if snapshot_dir and not os.path.isdir(snapshot_dir):
+                os.makedirs(snapshot_dir)
+            with open(self.path, 'w') as f:
+                json.dump(self.data, f, default = _encode)
+
+    def __expired(self):
+        return self.data['summaries'] is None or time.time() - self.data['summaries_fetched_at'] > self.ttl
+
+    def __load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f, object_hook = _decode)
+        except (IOError, ValueError):
+            return {'summaries': None, 'summaries_fetched_at': 0, 'changed': [], 'stacks': {}}
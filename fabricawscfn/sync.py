@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Template synchronizer between local dir and S3 bucket.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import fnmatch
+import hashlib
+import json
+import os
+import time
+
+from .lazy import LazyModule
+
+s3transfer = LazyModule('boto3.s3.transfer')
+
+
+class TemplateSync(object):
+    """
+    Synchronize templates local dir to S3 bucket by content hash.
+
+    Local file hashes are cached in manifest(Re-hash only files changed size or mtime),
+    and compared with ETag listed by one pass. If ETag is not MD5 of content(SSE-KMS or multipart uploaded object),
+    compared with sha256 metadata once per ETag. Only changed files are uploaded, removed files are deleted by batch.
+    """
+
+    # DeleteObjects accepts up to 1000 keys per request.
+    DELETE_BATCH_SIZE = 1000
+
+    def __init__(self, s3_client, bucket, prefix, local_dir, manifest_path,
+                 patterns = ('*.yaml', '*.yml', '*.json', '*.template'),
+                 max_workers = 4, multipart_threshold = 8 * 1024 * 1024):
+        """
+        Create TemplateSync.
+
+        :param s3_client: S3 client.
+        :param bucket: S3 bucket name.
+        :param prefix: S3 prefix(folder).
+        :param local_dir: Local dir for templates.
+        :param manifest_path: File path of local hash manifest.
+        :param patterns: File name patterns to synchronize.
+        :param max_workers: Max number of concurrent uploads.
+        :param multipart_threshold: File size to use multipart upload.
+        """
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.local_dir = local_dir
+        self.manifest_path = manifest_path
+        self.patterns = patterns
+        self.max_workers = max_workers
+        self.transfer_config = s3transfer.TransferConfig(multipart_threshold = multipart_threshold)
+
+    def s3_key(self, relative_path):
+        return '%s/%s' % (self.prefix, relative_path) if self.prefix else relative_path
+
+    def is_target(self, relative_path):
+        file_name = relative_path.split('/')[-1]
+        return any(fnmatch.fnmatch(file_name, pattern) for pattern in self.patterns)
+
+    def local_files(self):
+        """
+        Hash local templates. Reuse hashes in manifest if size and mtime are not changed.
+
+        :return: {Relative path, {'path', 'size', 'mtime', 'md5', 'sha256', 'verified'}}
+        """
+        manifest = self.__load_manifest()
+        files = {}
+        for dir_path, dir_names, file_names in os.walk(self.local_dir):
+            dir_names[:] = [dir_name for dir_name in dir_names if not dir_name.startswith('.')]
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                relative_path = os.path.relpath(path, self.local_dir).replace(os.sep, '/')
+                if not self.is_target(relative_path):
+                    continue
+                stat = os.stat(path)
+                cached = manifest.get(relative_path)
+                if cached is not None and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime:
+                    entry = dict(cached)
+                else:
+                    entry = dict(size = stat.st_size, mtime = stat.st_mtime, **self.__hash_file(path))
+                entry['path'] = path
+                # {Bucket/Key, ETag} of objects verified same content by sha256 metadata.
+                entry['verified'] = dict(entry.get('verified', {}))
+                files[relative_path] = entry
+        self.__save_manifest(files)
+        return files
+
+    def remote_objects(self):
+        """
+        List objects under prefix.
+
+        :return: {Relative path, Object summary}
+        """
+        prefix = '%s/' % self.prefix if self.prefix else ''
+        objects = {}
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket = self.bucket, Prefix = prefix):
+            for summary in page.get('Contents', []):
+                relative_path = summary['Key'][len(prefix):]
+                # Hidden dirs are skipped like local dir. (Templates uploaded by content hash)
+                if any(name.startswith('.') for name in relative_path.split('/')[:-1]):
+                    continue
+                if self.is_target(relative_path):
+                    objects[relative_path] = summary
+        return objects
+
+    def plan(self):
+        """
+        Compare local templates with S3 objects.
+
+        :return: (Files to upload, Keys to delete, Unchanged files)
+        """
+        files = self.local_files()
+        objects = self.remote_objects()
+
+        uploads = []
+        unchanged = []
+        for relative_path in sorted(files.keys()):
+            local_file = files[relative_path]
+            remote_object = objects.get(relative_path)
+            if remote_object is not None and self.__is_same(local_file, remote_object, relative_path):
+                unchanged.append((relative_path, local_file))
+            else:
+                uploads.append((relative_path, local_file))
+        deletes = sorted(relative_path for relative_path in objects.keys() if relative_path not in files)
+        self.__save_manifest(files)
+        return uploads, deletes, unchanged
+
+    def upload(self, relative_path, local_file):
+        self.s3_client.upload_file(
+            local_file['path'],
+            self.bucket,
+            self.s3_key(relative_path),
+            ExtraArgs = {'Metadata': {'sha256': local_file['sha256']}},
+            Config = self.transfer_config
+        )
+
+    def delete(self, relative_paths):
+        for i in range(0, len(relative_paths), self.DELETE_BATCH_SIZE):
+            batch = relative_paths[i:i + self.DELETE_BATCH_SIZE]
+            self.s3_client.delete_objects(
+                Bucket = self.bucket,
+                Delete = {
+                    'Objects': [{'Key': self.s3_key(relative_path)} for relative_path in batch],
+                    'Quiet': True
+                }
+            )
+
+    def sync(self, dryrun = False, echo = None):
+        """
+        Synchronize templates.
+
+        :param dryrun: Only show what would be done.
+        :param echo: Function to show progress. (OPTIONAL)
+        :return: Result {'uploaded', 'uploaded_bytes', 'deleted', 'unchanged', 'unchanged_bytes', 'elapsed'}
+        """
+        started = time.time()
+        uploads, deletes, unchanged = self.plan()
+
+        for relative_path, local_file in uploads:
+            if echo is not None:
+                echo('upload: %s to s3://%s/%s' % (local_file['path'], self.bucket, self.s3_key(relative_path)))
+        for relative_path in deletes:
+            if echo is not None:
+                echo('delete: s3://%s/%s' % (self.bucket, self.s3_key(relative_path)))
+
+        if not dryrun:
+            if uploads:
+                with ThreadPoolExecutor(max_workers = self.max_workers) as executor:
+                    futures = [executor.submit(self.upload, relative_path, local_file) for relative_path, local_file in uploads]
+                    for future in futures:
+                        future.result()
+            if deletes:
+                self.delete(deletes)
+
+        return dict(
+            uploaded = len(uploads),
+            uploaded_bytes = sum(local_file['size'] for _, local_file in uploads),
+            deleted = len(deletes),
+            unchanged = len(unchanged),
+            unchanged_bytes = sum(local_file['size'] for _, local_file in unchanged),
+            elapsed = time.time() - started
+        )
+
+    def __is_same(self, local_file, remote_object, relative_path):
+        etag = remote_object['ETag'].strip('"')
+        if etag == local_file['md5']:
+            # Single part uploaded object without SSE-KMS. ETag is MD5 of content.
+            return True
+        if remote_object['Size'] != local_file['size']:
+            return False
+        # ETag is changed whenever object is overwritten.
+        location = '%s/%s' % (self.bucket, self.s3_key(relative_path))
+        if local_file['verified'].get(location) == etag:
+            return True
+        # Compare content hash in metadata set by upload. (Objects without it are compared by ETag only)
+        head = self.s3_client.head_object(Bucket = self.bucket, Key = self.s3_key(relative_path))
+        sha256 = head.get('Metadata', {}).get('sha256')
+        if sha256 is None or sha256 != local_file['sha256']:
+            return False
+        local_file['verified'][location] = etag
+        return True
+
+    def __hash_file(self, path):
+        md5 = hashlib.md5()
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                md5.update(chunk)
+                sha256.update(chunk)
+        return dict(md5 = md5.hexdigest(), sha256 = sha256.hexdigest())
+
+    def __load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def __save_manifest(self, files):
+        manifest = {}
+        for relative_path, local_file in files.items():
+            manifest[relative_path] = dict(
+                (key, value) for key, value in local_file.items() if key != 'path'
+            )
+        manifest_dir = os.path.dirname(self.manifest_path)
+        if manifest_dir and not os.path.isdir(manifest_dir):
+            os.makedirs(manifest_dir)
+        with open(self.manifest_path, 'w') as f:
+            json.dump(manifest, f, indent = 2, sort_keys = True)
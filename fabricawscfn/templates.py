@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Local CloudFormation template helpers.
+"""
+import hashlib
+import json
+import re
+
+from .lazy import LazyModule
+
+yaml = LazyModule('yaml')
+
+_template_loader = None
+
+
+def _construct_intrinsic(loader, tag_suffix, node):
+    if isinstance(node, yaml.ScalarNode):
+        value = loader.construct_scalar(node)
+    elif isinstance(node, yaml.SequenceNode):
+        value = loader.construct_sequence(node, deep = True)
+    else:
+        value = loader.construct_mapping(node, deep = True)
+
+    if tag_suffix == 'Ref':
+        return {'Ref': value}
+    if tag_suffix == 'GetAtt' and not isinstance(value, list):
+        return {'Fn::GetAtt': value.split('.', 1)}
+    return {'Fn::%s' % tag_suffix: value}
+
+
+def template_loader():
+    """
+    YAML loader that understands CloudFormation short form intrinsic functions(!Ref, !Sub, ...).
+    Defined on first use, so yaml is not imported until a template is loaded.
+
+    :return: Loader class.
+    """
+    global _template_loader
+    if _template_loader is None:
+        loader = type('TemplateLoader', (yaml.SafeLoader,), {})
+        loader.add_multi_constructor('!', _construct_intrinsic)
+        _template_loader = loader
+    return _template_loader
+
+
+def load_template(template_local_path):
+    """
+    Load template file(YAML or JSON).
+
+    :param template_local_path: Template file path.
+    :return: Template document.
+    """
+    with open(template_local_path) as f:
+        if template_local_path.endswith('.json'):
+            return json.load(f)
+        return yaml.load(f, Loader = template_loader())
+
+
+def resolve_name(value, variables):
+    """
+    Resolve name expression(String or Fn::Sub) to comparable string.
+    Unresolvable placeholders are remain as is.
+
+    :param value: Name expression.
+    :param variables: Values for ${...} placeholders.
+    :return: Resolved name, or None if can not resolve.
+    """
+    if isinstance(value, dict) and 'Fn::Sub' in value:
+        sub = value['Fn::Sub']
+        if isinstance(sub, list):
+            text, sub_variables = sub[0], dict(variables)
+            for key, sub_value in sub[1].items():
+                if not isinstance(sub_value, dict):
+                    sub_variables[key] = sub_value
+        else:
+            text, sub_variables = sub, variables
+
+        def replace(match):
+            return '%s' % sub_variables.get(match.group(1), match.group(0))
+        return re.sub(r'\$\{([^}!]+)\}', replace, text)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys = True)
+    return '%s' % value
+
+
+def exported_names(template, variables):
+    """
+    Collect export names in template Outputs.
+
+    :param template: Template document.
+    :param variables: Values for ${...} placeholders.
+    :return: Set of export names.
+    """
+    names = set()
+    for output in (template.get('Outputs') or {}).values():
+        if isinstance(output, dict) and 'Export' in output:
+            names.add(resolve_name(output['Export'].get('Name'), variables))
+    return names
+
+
+def imported_names(template, variables):
+    """
+    Collect Fn::ImportValue names in template.
+
+    :param template: Template document.
+    :param variables: Values for ${...} placeholders.
+    :return: Set of imported names.
+    """
+    names = set()
+    nodes = [template]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == 'Fn::ImportValue':
+                    names.add(resolve_name(value, variables))
+                else:
+                    nodes.append(value)
+        elif isinstance(node, list):
+            nodes.extend(node)
+    return names
+
+
+def content_hash(body):
+    """
+    Hash template content.
+
+    :param body: Template content. (bytes)
+    :return: Hex digest of SHA-256.
+    """
+    return hashlib.sha256(body).hexdigest()
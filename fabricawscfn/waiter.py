@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Stack waiter streaming stack events.
+"""
+import time
+
+from .lazy import LazyModule
+
+botocore = LazyModule('botocore')
+
+# Limits of polling. (Seconds)
+MIN_DELAY = 2
+MAX_DELAY = 15
+TIMEOUT = 3600
+
+
+class StackEventWaiter(object):
+    """
+    Wait for stack operation complete by reading new stack events incrementally.
+
+    Unlike botocore waiters(polling DescribeStacks every 30 seconds), polls DescribeStackEvents
+    with adaptive delay, reads only events newer than the watermark,
+    and returns as soon as the stack reaches terminal status.
+    """
+
+    def __init__(self, cfn_client, stack_name, on_event = None, min_delay = MIN_DELAY, max_delay = MAX_DELAY,
+                 timeout = TIMEOUT, interrupted = None):
+        """
+        Create StackEventWaiter.
+
+        :param cfn_client: CloudFormation client.
+        :param stack_name: Stack name.
+        :param on_event: Function called with each new event. (OPTIONAL)
+        :param min_delay: Min seconds between polling.
+        :param max_delay: Max seconds between polling.
+        :param timeout: Seconds to give up waiting.
+        :param interrupted: threading.Event set to stop waiting. (OPTIONAL. Stack operation is not canceled)
+        """
+        self.cfn_client = cfn_client
+        self.stack_name = stack_name
+        self.stack_id = None
+        self.on_event = on_event
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.interrupted = interrupted
+        self.last_event_id = None
+
+    def mark(self):
+        """
+        Remember latest event as watermark. Call before start stack operation.
+
+        :return: True if stack exists.
+        """
+        try:
+            events = self.cfn_client.describe_stack_events(StackName = self.stack_name)['StackEvents']
+        except botocore.exceptions.ClientError as e:
+            if 'does not exist' in e.response['Error']['Message']:
+                return False
+            raise e
+        if events:
+            self.last_event_id = events[0]['EventId']
+            # Stack id is needed to read events after stack deleted.
+            self.stack_id = events[0]['StackId']
+        return True
+
+    def new_events(self, limit = None):
+        """
+        Fetch events newer than watermark, and move watermark.
+
+        :param limit: Max events to read. Older events are skipped. (OPTIONAL. For the first read without watermark)
+        :return: New events. (Oldest first)
+        """
+        events = []
+        args = {'StackName': self.stack_id or self.stack_name}
+        while True:
+            page = self.cfn_client.describe_stack_events(**args)
+            for event in page['StackEvents']:
+                if event['EventId'] == self.last_event_id or (limit is not None and len(events) >= limit):
+                    break
+                events.append(event)
+            else:
+                if page.get('NextToken') and (limit is None or len(events) < limit):
+                    args['NextToken'] = page['NextToken']
+                    continue
+            break
+
+        if events:
+            self.last_event_id = events[0]['EventId']
+            self.stack_id = events[0]['StackId']
+        events.reverse()
+        return events
+
+    def wait(self, success_status):
+        """
+        Wait for stack reaches terminal status.
+
+        :param success_status: Expected terminal stack status. (Like CREATE_COMPLETE)
+        :return: Terminal stack event.
+        """
+        started = time.time()
+        delay = self.min_delay
+        failed_event = None
+        while True:
+            events = self.new_events()
+            for event in events:
+                if self.on_event is not None:
+                    self.on_event(event)
+
+                status = event['ResourceStatus']
+                if failed_event is None and status.endswith('_FAILED') and event.get('ResourceStatusReason'):
+                    failed_event = event
+
+                if self.__is_stack_event(event) and not status.endswith('_IN_PROGRESS'):
+                    if status == success_status:
+                        return event
+                    reason = failed_event or event
+                    raise Exception('Stack %s is %s. %s %s: %s' % (
+                        self.stack_name,
+                        status,
+                        reason['LogicalResourceId'],
+                        reason['ResourceStatus'],
+                        reason.get('ResourceStatusReason', '-')
+                    ))
+
+            if self.timeout is not None and time.time() - started > self.timeout:
+                raise Exception('Timed out waiting for stack %s %s.' % (self.stack_name, success_status))
+
+            # Poll quickly while stack is progressing, back off while idle.
+            delay = self.min_delay if events else min(delay * 1.5, self.max_delay)
+            if self.interrupted is None:
+                time.sleep(delay)
+            elif self.interrupted.wait(delay):
+                raise Exception('Stopped waiting for stack %s %s. (Interrupted)' % (self.stack_name, success_status))
+
+    def __is_stack_event(self, event):
+        return event['ResourceType'] == 'AWS::CloudFormation::Stack' and event['PhysicalResourceId'] == event['StackId']
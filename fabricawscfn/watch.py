@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Watcher of stack statuses.
+"""
+from collections import OrderedDict, deque
+
+from .waiter import StackEventWaiter
+
+
+class StackWatcher(object):
+    """
+    Track statuses of stacks by one ListStacks sweep per tick,
+    and read new events only of stacks changed since last tick or in progress.
+    """
+
+    def __init__(self, cfn_client, lookup, status_filter, max_events = 10, map_func = map):
+        """
+        Create StackWatcher.
+
+        :param cfn_client: CloudFormation client.
+        :param lookup: Function returns stack alias of stack name, or None if stack is not watched.
+        :param status_filter: StackStatusFilter of ListStacks.
+        :param max_events: Number of latest events kept.
+        :param map_func: Function applies function to items. (Like StackGroup#map_concurrently)
+        """
+        self.cfn_client = cfn_client
+        self.lookup = lookup
+        self.status_filter = status_filter
+        self.map_func = map_func
+        # {Stack name, Stack summary}
+        self.summaries = OrderedDict()
+        # {Stack name, StackEventWaiter} Watermarks of events read.
+        self.tails = {}
+        # {Stack name, Latest event}
+        self.last_events = {}
+        # Latest events of all stacks. [(Stack name, Event)] (Oldest first)
+        self.events = deque(maxlen = max_events)
+        self.max_events = max_events
+        self.ticks = 0
+
+    def tick(self):
+        """
+        Refresh stack summaries, and read new events of changed stacks.
+
+        :return: Names of changed stacks.
+        """
+        summaries = OrderedDict()
+        paginator = self.cfn_client.get_paginator('list_stacks')
+        for page in paginator.paginate(StackStatusFilter = self.status_filter):
+            for summary in page['StackSummaries']:
+                if self.lookup(summary['StackName']) is not None:
+                    summaries[summary['StackName']] = summary
+
+        # Stacks deleted since last tick are not listed. Keep them as deleted.
+        for stack_name, summary in self.summaries.items():
+            if stack_name not in summaries:
+                summaries[stack_name] = dict(summary, StackStatus = 'DELETE_COMPLETE')
+
+        # Events of idle stacks are not read on first tick.
+        changed = [
+            stack_name for stack_name, summary in summaries.items()
+            if summary['StackStatus'].endswith('_IN_PROGRESS')
+            or (self.ticks and self.__fingerprint(summary) != self.__fingerprint(self.summaries.get(stack_name)))
+        ]
+        self.summaries = summaries
+        self.ticks += 1
+
+        new_events = []
+        for stack_name, events in zip(changed, self.map_func(self.__tail, changed)):
+            new_events.extend((stack_name, event) for event in events)
+            if events:
+                self.last_events[stack_name] = events[-1]
+        for stack_name, event in sorted(new_events, key = lambda item: item[1]['Timestamp']):
+            self.events.append((stack_name, event))
+        return changed
+
+    def in_progress(self):
+        """
+        :return: True if any stack is in progress.
+        """
+        return any(summary['StackStatus'].endswith('_IN_PROGRESS') for summary in self.summaries.values())
+
+    def __tail(self, stack_name):
+        tail = self.tails.get(stack_name)
+        if tail is None:
+            # Stack id keeps reading events after stack deleted.
+            tail = self.tails[stack_name] = StackEventWaiter(self.cfn_client, stack_name)
+            tail.stack_id = self.summaries[stack_name].get('StackId')
+            # First read is only the latest events.
+            return tail.new_events(self.max_events)
+        return tail.new_events()
+
+    def __fingerprint(self, summary):
+        if summary is None:
+            return None
+        return summary['StackStatus'], summary.get('LastUpdatedTime'), summary.get('DeletionTime')
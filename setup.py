@@ -14,6 +14,8 @@ setup(
   install_requires = [
     'fabric',
     'boto3',
-    'prettytable'
+    'prettytable',
+    'PyYAML',
+    'futures; python_version < "3.2"'
   ]
 )
\ No newline at end of file